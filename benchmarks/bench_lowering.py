@@ -0,0 +1,94 @@
+"""Separate passes vs fused backend lowering.
+
+Lowers the same TACKY program with TackyToAssembly + PseudoReplacer +
+StackSlotColoring + FixingUpInstructions and with FusedLowering, checks
+that both produce the same instructions, and reports time per output
+instruction, allocated memory blocks and peak traced memory for each.
+
+    python benchmarks/bench_lowering.py
+    python benchmarks/bench_lowering.py --depth 20000
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent / "src"))
+sys.path.insert(0, str(BENCH_DIR))
+
+from cygnet.lexer import Lexer
+from cygnet.parser import Parser
+from cygnet.tackygen import TackyGenerator
+from cygnet.codegen import TackyToAssembly, PseudoReplacer, FixingUpInstructions, FusedLowering
+from cygnet.regalloc import StackSlotColoring
+import generators
+
+
+def passes(ir):
+    asm = TackyToAssembly(ir).generate()
+    colored = StackSlotColoring(PseudoReplacer(asm).replace()).replace()
+    return FixingUpInstructions(colored).replace()
+
+
+def fused(ir):
+    return FusedLowering(ir).generate()
+
+
+LOWERINGS = {
+    "passes": passes,
+    "fused": fused,
+}
+
+
+def time_per_instruction(lower, ir, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        program = lower(ir)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(program.function.instructions), len(program.function.instructions)
+
+
+def allocations(lower, ir):
+    # Blocks still held by the lowered program, and peak memory while
+    # lowering, which includes the intermediate programs of the separate passes
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.take_snapshot()
+    blocks_before = sum(stat.count for stat in before.statistics("filename"))
+    program = lower(ir)
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks_after = sum(stat.count for stat in after.statistics("filename"))
+    del program
+    return blocks_after - blocks_before, peak
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cygnet backend lowering benchmark")
+    parser.add_argument("--depth", type=int, default=5000, help="Nesting depth of the generated expression")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing samples, the best is kept")
+    args = parser.parse_args(argv)
+
+    source = generators.nested_unary(args.depth)
+    ir = TackyGenerator(Parser(Lexer(source).lex_buffer()).parse()).generate()
+
+    if passes(ir) != fused(ir):
+        print("passes and fused lowering disagree")
+        return 1
+
+    print(f"{'lowering':<12}{'ns/insn':>10}{'blocks kept':>14}{'peak KiB':>12}")
+    for name, lower in LOWERINGS.items():
+        per_insn, _ = time_per_instruction(lower, ir, args.repeat)
+        blocks, peak = allocations(lower, ir)
+        print(f"{name:<12}{per_insn * 1e9:>10.1f}{blocks:>14,}{peak / 1024:>12.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""Per-program cost of checking results: link and exec, JIT, interpreter.
+
+Each random program is lowered once. Then its result is taken three
+ways: the usual way, by assembling and linking it with gcc and running
+the executable; with jit.run_program; and by interpreting its TACKY.
+All three must agree, so the TACKY interpreter also acts as an oracle
+for the backend.
+
+    python benchmarks/bench_run.py
+    python benchmarks/bench_run.py --count 200
+"""
+
+import argparse
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent / "src"))
+sys.path.insert(0, str(BENCH_DIR))
+
+from cygnet.lexer import Lexer
+from cygnet.parser import Parser
+from cygnet.tackygen import TackyGenerator
+from cygnet.codegen import FusedLowering
+from cygnet.emitter import Emitter
+from cygnet.jit import run_program
+from cygnet.interpreter import interpret
+import generators
+
+
+def random_program(rng):
+    return generators.nested_mixed(rng.randint(1, 30), value=rng.randint(0, 1000), seed=rng.randint(0, 10**6))
+
+
+def front_end(source):
+    return TackyGenerator(Parser(Lexer(source).lex_buffer()).parse()).generate()
+
+
+def exec_status(program, workdir):
+    emitter = Emitter(program)
+    emitter.emit_program(program)
+    executable = workdir / "program"
+    subprocess.run(["gcc", "-x", "assembler", "-", "-o", executable], input=emitter.get_assembly() + "\n",
+                   text=True, check=True)
+    return subprocess.run([executable]).returncode
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cygnet exec vs JIT benchmark")
+    parser.add_argument("--count", type=int, default=50, help="Number of random programs")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    irs = [front_end(random_program(rng)) for _ in range(args.count)]
+    programs = [FusedLowering(ir).generate() for ir in irs]
+
+    with tempfile.TemporaryDirectory(prefix="cygnet-run-") as temp_dir:
+        start = time.perf_counter()
+        expected = [exec_status(program, Path(temp_dir)) for program in programs]
+        exec_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = [run_program(program) & 0xFF for program in programs]
+    jit_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    interpreted = [interpret(ir) & 0xFF for ir in irs]
+    interpret_seconds = time.perf_counter() - start
+
+    mismatches = sum(len({status, result, value}) != 1 for status, result, value in zip(expected, results, interpreted))
+    print(f"link+exec  {exec_seconds / args.count * 1e6:>12.1f} us/program")
+    print(f"jit        {jit_seconds / args.count * 1e6:>12.1f} us/program")
+    print(f"interpret  {interpret_seconds / args.count * 1e6:>12.1f} us/program")
+    print(f"{mismatches} mismatches")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""Stage-level microbenchmarks for the compiler front and back end.
+
+Each benchmark feeds a synthetic source (see generators.py) through one
+stage and reports its throughput: tokens/sec for the Lexer (bytes/sec for
+comment-heavy input), nodes/sec for the Parser, instructions/sec for
+TackyGenerator and TackyToAssembly and lines/sec for the Emitter. Results are written as JSON and can be compared
+against a stored baseline, a benchmark that drops by more than the
+tolerance counts as a regression.
+
+    python benchmarks/bench_stages.py
+    python benchmarks/bench_stages.py --output results.json
+    python benchmarks/bench_stages.py --compare benchmarks/baseline.json
+    python benchmarks/bench_stages.py --save-baseline
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+# Benchmark the working tree rather than any installed copy
+sys.path.insert(0, str(BENCH_DIR.parent / "src"))
+sys.path.insert(0, str(BENCH_DIR))
+
+from cygnet.lexer import Lexer
+from cygnet.parser import Parser
+from cygnet.tackygen import TackyGenerator
+from cygnet.codegen import TackyToAssembly, PseudoReplacer, FixingUpInstructions
+from cygnet.emitter import Emitter, StreamEmitter
+from cygnet.metrics import count_nodes
+import generators
+from reporting import write_report, load_results, compare
+
+BASELINE_FILE = BENCH_DIR / "baseline.json"
+
+# Expression depth for sources that go through the parser and later stages
+DEPTH = 200
+
+
+def _front_end(source):
+    ast = Parser(Lexer(source).lex_buffer()).parse()
+    ir = TackyGenerator(ast).generate()
+    return ast, ir
+
+
+def _back_end(ir):
+    asm = TackyToAssembly(ir).generate()
+    return FixingUpInstructions(PseudoReplacer(asm).replace()).replace()
+
+
+def bench_lexer(source):
+    return len(Lexer(source).lex_buffer())
+
+
+def bench_lexer_bytes(source):
+    Lexer(source).lex_buffer()
+    return len(source)
+
+
+def bench_parser(tokens):
+    return count_nodes(Parser(tokens).parse())
+
+
+def bench_parser_tokens(tokens):
+    parser = Parser(tokens)
+    parser.parse()
+    return parser.current
+
+
+def bench_tacky(ast):
+    return len(TackyGenerator(ast).generate().function.body)
+
+
+def bench_codegen(ir):
+    return len(TackyToAssembly(ir).generate().function.instructions)
+
+
+def bench_emitter(program):
+    emitter = Emitter(program)
+    emitter.emit_program(program)
+    return emitter.get_assembly().count("\n") + 1
+
+
+def bench_emitter_stream(program):
+    # Streamed to a sink, as for -S and linking, never held as one string
+    with open(os.devnull, "w") as sink:
+        emitter = StreamEmitter(sink)
+        emitter.emit_program(program)
+        emitter.flush()
+    return len(program.function.instructions) + 8
+
+
+# Benchmark name -> (unit, setup() -> input, run(input) -> work done)
+BENCHMARKS = {
+    "lexer.many_functions": ("tokens/s", lambda: generators.many_functions(2000), bench_lexer),
+    "lexer.many_statements": ("tokens/s", lambda: generators.many_statements(5000), bench_lexer),
+    "lexer.long_comments": ("bytes/s", lambda: generators.long_comments(5000), bench_lexer_bytes),
+    "lexer.nested_mixed": ("tokens/s", lambda: generators.nested_mixed(DEPTH), bench_lexer),
+    "parser.nested_unary": ("nodes/s", lambda: Lexer(generators.nested_unary(DEPTH)).lex_buffer(), bench_parser),
+    "parser.nested_parens": ("tokens/s", lambda: Lexer(generators.nested_parens(DEPTH)).lex_buffer(), bench_parser_tokens),
+    "parser.nested_mixed": ("nodes/s", lambda: Lexer(generators.nested_mixed(DEPTH)).lex_buffer(), bench_parser),
+    "tacky.nested_unary": ("instructions/s", lambda: _front_end(generators.nested_unary(DEPTH))[0], bench_tacky),
+    "codegen.nested_unary": ("instructions/s", lambda: _front_end(generators.nested_unary(DEPTH))[1], bench_codegen),
+    "emitter.nested_unary": ("lines/s", lambda: _back_end(_front_end(generators.nested_unary(DEPTH))[1]), bench_emitter),
+    "emitter.stream": ("lines/s", lambda: _back_end(_front_end(generators.nested_unary(DEPTH))[1]), bench_emitter_stream),
+}
+
+
+def measure(setup, run, repeat, min_time):
+    # Best-of-repeat throughput, each sample loops until it has run for at
+    # least min_time seconds so tiny inputs still get a stable reading
+    data = setup()
+    best = None
+    work = 0
+    for _ in range(repeat):
+        loops = 0
+        start = time.perf_counter()
+        while True:
+            work = run(data)
+            loops += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        rate = work * loops / elapsed
+        best = rate if best is None else max(best, rate)
+    return best, work
+
+
+def run_benchmarks(selected, repeat, min_time):
+    results = {}
+    for name, (unit, setup, run) in BENCHMARKS.items():
+        if selected and not any(name.startswith(prefix) for prefix in selected):
+            continue
+        rate, work = measure(setup, run, repeat, min_time)
+        results[name] = {"unit": unit, "rate": rate, "work": work}
+        print(f"{name:<28}{rate:>16,.0f} {unit}  ({work} per run)")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cygnet stage benchmarks")
+    parser.add_argument("benchmarks", nargs="*", help="Only run benchmarks starting with these prefixes")
+    parser.add_argument("--output", type=Path, help="Write results to this JSON file")
+    parser.add_argument("--compare", type=Path, nargs="?", const=BASELINE_FILE, help="Compare against a baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Overwrite {BASELINE_FILE.name} with these results")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before flagging a regression (default 0.2)")
+    parser.add_argument("--repeat", type=int, default=5, help="Samples per benchmark, the best is kept")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds per sample")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.benchmarks, args.repeat, args.min_time)
+
+    if args.output:
+        write_report(args.output, results)
+    if args.save_baseline:
+        write_report(BASELINE_FILE, results)
+
+    if args.compare:
+        regressions = compare(results, load_results(args.compare), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
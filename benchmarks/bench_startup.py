@@ -0,0 +1,132 @@
+"""Cold-start benchmarks: how long a fresh interpreter takes to import the
+compiler and to run short CLI invocations. Short compiles are dominated
+by this cost, so it is tracked like any other stage.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --compare
+    python benchmarks/bench_startup.py --importtime
+    python benchmarks/bench_startup.py --server
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+SRC_DIR = BENCH_DIR.parent / "src"
+sys.path.insert(0, str(BENCH_DIR))
+
+import generators
+from reporting import write_report, load_results, compare
+
+BASELINE_FILE = BENCH_DIR / "startup_baseline.json"
+
+
+def _commands(source: Path, server: bool):
+    # Benchmark name -> command line, each run in a fresh interpreter
+    python = sys.executable
+    commands = {
+        "python.bare": [python, "-c", "pass"],
+        "import.cygnet_main": [python, "-c", "import cygnet.main"],
+        "cli.lex": [python, "-m", "cygnet.main", "--lex", str(source)],
+        "cli.codegen": [python, "-m", "cygnet.main", "--codegen", str(source)],
+    }
+    if server:
+        commands["client.lex"] = [python, "-m", "cygnet.client", "--lex", str(source)]
+        commands["client.codegen"] = [python, "-m", "cygnet.client", "--codegen", str(source)]
+    return commands
+
+
+def start_server(socket_path: Path, env):
+    # Compile server for the client.* benchmarks, returns once it accepts
+    server = subprocess.Popen([sys.executable, "-m", "cygnet.server", "--socket", str(socket_path)],
+                              env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.perf_counter() + 10
+    while not socket_path.exists():
+        if server.poll() is not None or time.perf_counter() > deadline:
+            server.kill()
+            raise RuntimeError("Compile server did not start")
+        time.sleep(0.05)
+    return server
+
+
+def measure(command, repeat, env):
+    # Best wall time over repeat runs, reported as runs/s so higher is better
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def show_importtime(env, limit=15):
+    # Slowest modules by cumulative import time
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import cygnet.main"],
+                            env=env, capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_part, cumulative_us, module = line.split("|", 2)
+        rows.append((int(cumulative_us), int(self_part.split(":")[1]), module.rstrip()))
+    rows.sort(reverse=True)
+    print(f"\n{'cumulative us':>14}{'self us':>10}  module")
+    for cumulative_us, self_us, module in rows[:limit]:
+        print(f"{cumulative_us:>14}{self_us:>10}  {module}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cygnet startup benchmarks")
+    parser.add_argument("--output", type=Path, help="Write results to this JSON file")
+    parser.add_argument("--compare", type=Path, nargs="?", const=BASELINE_FILE, help="Compare against a baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Overwrite {BASELINE_FILE.name} with these results")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before flagging a regression (default 0.2)")
+    parser.add_argument("--repeat", type=int, default=10, help="Runs per benchmark, the fastest is kept")
+    parser.add_argument("--importtime", action="store_true", help="Also list the slowest imports")
+    parser.add_argument("--server", action="store_true", help="Also time the same runs through a warm compile server")
+    args = parser.parse_args(argv)
+
+    env = dict(os.environ, PYTHONPATH=str(SRC_DIR))
+    results = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        source = Path(temp_dir) / "startup.c"
+        source.write_text(generators.nested_unary(10))
+        server = None
+        if args.server:
+            socket_path = Path(temp_dir) / "server.sock"
+            env["CYGNET_SOCKET"] = str(socket_path)
+            server = start_server(socket_path, env)
+        try:
+            for name, command in _commands(source, args.server).items():
+                seconds = measure(command, args.repeat, env)
+                results[name] = {"unit": "runs/s", "rate": 1 / seconds, "work": 1}
+                print(f"{name:<28}{seconds * 1000:>10.1f} ms")
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+    if args.importtime:
+        show_importtime(env)
+
+    if args.output:
+        write_report(args.output, results)
+    if args.save_baseline:
+        write_report(BASELINE_FILE, results)
+
+    if args.compare:
+        regressions = compare(results, load_results(args.compare), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
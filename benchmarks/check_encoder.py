@@ -0,0 +1,131 @@
+"""Byte-for-byte check of the built-in encoder against GNU as.
+
+Every program is emitted as text and assembled with `as`, and its .text
+section is compared with what X86Encoder produces. The programs are
+random nested expressions through the -O0 and -O1 backends, plus a
+synthetic function that uses every instruction form with every register,
+near and far stack slots and edge-case immediates. The objects written
+by encode_object are also linked and run against gcc's result.
+
+    python benchmarks/check_encoder.py
+    python benchmarks/check_encoder.py --count 500
+"""
+
+import argparse
+import random
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent / "src"))
+
+from cygnet.lexer import Lexer
+from cygnet.parser import Parser
+from cygnet.tackygen import TackyGenerator
+from cygnet.optimizer import optimize
+from cygnet.codegen import (Program, Function, Mov, Unary, Ret, AllocateStack, Imm, Register, Stack, Neg, Not,
+                            TackyToAssembly, FixingUpInstructions, FusedLowering)
+from cygnet.regalloc import RegisterAllocator, StackSlotColoring
+from cygnet.peephole import PeepholeOptimizer
+from cygnet.emitter import Emitter
+from cygnet.encoder import X86Encoder, encode_object, REGISTER_CODES
+
+
+def random_source(rng):
+    operators = []
+    for _ in range(rng.randint(0, 40)):
+        choice = rng.choice("~-(")
+        if choice == "-" and operators and operators[-1] == "-":
+            choice = "("
+        operators.append(choice)
+    value = rng.choice([0, 1, 7, 255, 1000, 2147483647, 2147483648, 4294967295])
+    return "int main(void) { return %s%d%s; }" % ("".join(operators), value, ")" * operators.count("("))
+
+
+def lower_o0(source):
+    ir = TackyGenerator(Parser(Lexer(source).lex_buffer()).parse()).generate()
+    return FusedLowering(ir).generate()
+
+
+def lower_o1(source):
+    ir = optimize(TackyGenerator(Parser(Lexer(source).lex_buffer()).parse()).generate(), 1)
+    asm = StackSlotColoring(RegisterAllocator(TackyToAssembly(ir).generate()).replace()).replace()
+    return PeepholeOptimizer(FixingUpInstructions(asm).replace()).optimize()
+
+
+def every_form():
+    # Each mov, neg and not shape the backend can produce, for every register
+    registers = [Register(reg) for reg in REGISTER_CODES]
+    slots = [Stack(-4), Stack(-128), Stack(-132), Stack(-40000)]
+    immediates = [Imm("0"), Imm("-1"), Imm("2147483647"), Imm("-2147483648"), Imm("4294967295"), Imm("010")]
+    instructions = [AllocateStack(-40000)]
+    for reg in registers:
+        instructions += [Mov(imm, reg) for imm in immediates]
+        instructions += [Mov(reg, other) for other in registers]
+        instructions += [Mov(reg, slot) for slot in slots]
+        instructions += [Mov(slot, reg) for slot in slots]
+        instructions += [Unary(Neg(), reg), Unary(Not(), reg)]
+    for slot in slots:
+        instructions += [Mov(imm, slot) for imm in immediates]
+        instructions += [Unary(Neg(), slot), Unary(Not(), slot)]
+    instructions += [AllocateStack(-120), AllocateStack(0), Ret()]
+    return Program(Function("main", instructions))
+
+
+def gnu_text(program, workdir):
+    emitter = Emitter(program)
+    emitter.emit_program(program)
+    (workdir / "gnu.s").write_text(emitter.get_assembly() + "\n")
+    subprocess.run(["as", workdir / "gnu.s", "-o", workdir / "gnu.o"], check=True, capture_output=True)
+    subprocess.run(["objcopy", "-O", "binary", "-j", ".text", workdir / "gnu.o", workdir / "gnu.bin"], check=True)
+    return (workdir / "gnu.bin").read_bytes()
+
+
+def run_linked(program, workdir):
+    # Exit status of the program linked from our object and from gcc's
+    (workdir / "ours.o").write_bytes(encode_object(program))
+    subprocess.run(["gcc", workdir / "ours.o", "-o", workdir / "ours"], check=True)
+    subprocess.run(["gcc", workdir / "gnu.o", "-o", workdir / "gnu"], check=True)
+    return (subprocess.run([workdir / "ours"]).returncode, subprocess.run([workdir / "gnu"]).returncode)
+
+
+def check(name, program, workdir, run):
+    ours = X86Encoder(program).encode()
+    theirs = gnu_text(program, workdir)
+    if ours != theirs:
+        print(f"FAIL {name}: .text differs\n  ours: {ours.hex()}\n  as:   {theirs.hex()}")
+        return False
+    if run:
+        ours_status, gnu_status = run_linked(program, workdir)
+        if ours_status != gnu_status:
+            print(f"FAIL {name}: exit status {ours_status}, gcc build {gnu_status}")
+            return False
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the built-in encoder with GNU as")
+    parser.add_argument("--count", type=int, default=100, help="Random programs per backend")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    failures = 0
+    checked = 0
+    with tempfile.TemporaryDirectory(prefix="cygnet-encoder-") as temp_dir:
+        workdir = Path(temp_dir)
+        failures += not check("every_form", every_form(), workdir, run=False)
+        checked += 1
+        for index in range(args.count):
+            source = random_source(rng)
+            for backend, lower in (("O0", lower_o0), ("O1", lower_o1)):
+                failures += not check(f"{backend} {source}", lower(source), workdir, run=index % 10 == 0)
+                checked += 1
+    print(f"{checked - failures}/{checked} programs match")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+import random
+
+# Synthetic C sources for the stage benchmarks.
+#
+# The language is still a single `int main(void) { return <exp>; }`, so
+# sources meant for the parser and later stages grow through the one
+# return expression. Sources meant only for the lexer can be as large as
+# we like: many functions and statements tokenize fine even though the
+# parser would reject them.
+
+UNARY_OPERATORS = ("~", "-")
+
+
+def program(expression: str, name: str = "main") -> str:
+    return f"int {name}(void) {{\n    return {expression};\n}}\n"
+
+
+def nested_unary(depth: int, value: int = 2) -> str:
+    # ~-~-...2, alternating so no '--' decrement token is formed
+    operators = "".join(UNARY_OPERATORS[i % 2] for i in range(depth))
+    return program(f"{operators}{value}")
+
+
+def nested_parens(depth: int, value: int = 2) -> str:
+    return program("(" * depth + str(value) + ")" * depth)
+
+
+def nested_mixed(depth: int, value: int = 2, seed: int = 0) -> str:
+    # Random mix of ~, - and parentheses, e.g. ~(-(~(2)))
+    rng = random.Random(seed)
+    prefix = []
+    closing = 0
+    previous = None
+    for _ in range(depth):
+        choice = rng.choice(("~", "-", "("))
+        if choice == "-" and previous == "-":
+            choice = "("
+        prefix.append(choice)
+        if choice == "(":
+            closing += 1
+        previous = choice
+    return program("".join(prefix) + str(value) + ")" * closing)
+
+
+def many_functions(count: int) -> str:
+    # Lexer-only input: one small function per entry
+    return "".join(program(f"~(-{i % 1000})", name=f"f{i}") for i in range(count))
+
+
+def many_statements(count: int) -> str:
+    # Lexer-only input: a long function body of return statements
+    body = "".join(f"    return -(~{i % 1000});\n" for i in range(count))
+    return f"int main(void) {{\n{body}}}\n"
+
+
+def long_comments(lines: int, expression: str = "~(-2)") -> str:
+    # Block and line comments in front of a small valid program
+    block = "/*\n" + "".join(f" * comment line {i} with some words in it\n" for i in range(lines)) + " */\n"
+    line_comments = "".join(f"// line comment {i} with some words in it\n" for i in range(lines))
+    return block + line_comments + program(expression)
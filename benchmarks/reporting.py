@@ -0,0 +1,36 @@
+import json
+import platform
+from pathlib import Path
+
+# Shared result format for the benchmark scripts: every benchmark has a
+# rate where higher is better, so one comparison works for all of them.
+
+
+def write_report(path: Path, results):
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+    path.write_text(json.dumps(report, indent=2) + "\n")
+
+
+def load_results(path: Path):
+    return json.loads(path.read_text())["results"]
+
+
+def compare(results, baseline, tolerance):
+    # Returns the names of benchmarks slower than baseline by more than tolerance
+    regressions = []
+    print(f"\n{'benchmark':<28}{'baseline':>16}{'current':>16}{'change':>10}")
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]["rate"]
+        change = result["rate"] / before - 1
+        flag = ""
+        if change < -tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<28}{before:>16,.2f}{result['rate']:>16,.2f}{change:>+9.1%}{flag}")
+    return regressions
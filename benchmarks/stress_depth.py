@@ -0,0 +1,112 @@
+"""Stress checks for deeply nested expressions.
+
+For each stage the input size is scaled up and the time per node must
+stay roughly flat (linear scaling), then a very deep input must go
+through without hitting Python's recursion limit.
+
+    python benchmarks/stress_depth.py
+    python benchmarks/stress_depth.py --max-depth 1000000
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent / "src"))
+sys.path.insert(0, str(BENCH_DIR))
+
+from cygnet.lexer import Lexer
+from cygnet.parser import Parser, Program, Function, Return, Constant, Unary, Complement, Negate
+from cygnet.tackygen import TackyGenerator
+from cygnet.metrics import count_nodes
+import generators
+
+# Time per node at the largest size may be at most this multiple of the smallest
+MAX_SLOWDOWN = 2.5
+
+
+def unary_ast(depth):
+    # Built directly so the check covers lowering alone
+    exp = Constant(1, "2")
+    for i in range(depth):
+        exp = Unary(1, Complement(1) if i % 2 else Negate(1), exp)
+    return Program(1, Function(1, "main", Return(1, exp)))
+
+
+def tokens_for(generate):
+    return lambda depth: Lexer(generate(depth)).lex_buffer()
+
+
+def parse(tokens):
+    # Number of Exp nodes, i.e. the Unary chain plus its Constant
+    return count_nodes(Parser(tokens).parse()) - 3
+
+
+def parse_parens(tokens):
+    # Parentheses add no nodes, so count the tokens consumed instead
+    parser = Parser(tokens)
+    parser.parse()
+    return parser.current
+
+
+def lower(ast):
+    return len(TackyGenerator(ast).generate().function.body)
+
+
+# Stage name -> (build input for a depth, run the stage, expected work for a depth)
+STAGES = {
+    "parser.unary": (tokens_for(generators.nested_unary), parse, lambda depth: 2 * depth + 1),
+    "parser.parens": (tokens_for(generators.nested_parens), parse_parens, lambda depth: 2 * depth + 11),
+    "tacky": (unary_ast, lower, lambda depth: depth + 1),
+}
+
+
+def best_time(run, data, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(data)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def check_stage(name, build, run, expected, sizes, max_depth):
+    ok = True
+    per_node = []
+    for size in sizes:
+        seconds = best_time(run, build(size))
+        per_node.append(seconds / size)
+        print(f"{name:<15}depth {size:>9,}  {seconds * 1000:>9.2f} ms  {seconds / size * 1e9:>8.1f} ns/node")
+    slowdown = per_node[-1] / per_node[0]
+    if slowdown > MAX_SLOWDOWN:
+        print(f"{name:<15}FAIL: time per node grew {slowdown:.1f}x from depth {sizes[0]:,} to {sizes[-1]:,}")
+        ok = False
+
+    work = run(build(max_depth))
+    if work != expected(max_depth):
+        print(f"{name:<15}FAIL: depth {max_depth:,} produced {work}, expected {expected(max_depth)}")
+        ok = False
+    else:
+        print(f"{name:<15}depth {max_depth:,} ok")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cygnet nesting depth stress checks")
+    parser.add_argument("stages", nargs="*", help=f"Stages to check (default: {', '.join(STAGES)})")
+    parser.add_argument("--max-depth", type=int, default=200_000, help="Depth that must compile without error")
+    args = parser.parse_args(argv)
+
+    sizes = [2_000, 8_000, 32_000]
+    ok = True
+    for name in args.stages or STAGES:
+        build, run, expected = STAGES[name]
+        ok = check_stage(name, build, run, expected, sizes, args.max_depth) and ok
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
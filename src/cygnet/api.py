@@ -0,0 +1,206 @@
+from collections import OrderedDict
+from functools import cached_property
+from pathlib import Path
+from typing import Iterable, List, Optional
+from .enums import PrintFlags, CompileOptions
+from .errors import PreprocessorUnsupported, PreprocessorError
+from .metrics import PipelineMetrics
+
+# Library interface for embedding the compiler, e.g. in a test harness:
+#
+#     compiler = Compiler(CompileOptions(opt_level=1))
+#     result = compiler.compile_source("int main(void) { return ~5; }")
+#     result.assembly, result.run()
+#
+# Nothing is printed and nothing touches the disk: each stage runs on
+# in-memory text the first time its result is read, and a failing stage
+# raises its CompilerError. Only options that change the generated code
+# apply (builtin_preprocessor, opt_level); cache, output and print options
+# belong to the command line driver.
+
+DEFAULT_RESULT_CACHE_SIZE = 128
+
+# Nothing is printed, so no stage needs the IR printing passes
+NO_PRINT = PrintFlags()
+
+
+class CompileResult:
+    # One compile of a source text. Every property is computed on first use
+    # from the one before it and kept, so reading only .ast never runs the
+    # back end and reading .assembly twice lowers once.
+    def __init__(self, text: str, options: CompileOptions, name: str = "<source>", base_dir: Optional[Path] = None):
+        self.text = text
+        self.options = options
+        self.name = name
+        self.base_dir = base_dir or Path.cwd()
+        self.metrics = PipelineMetrics(name, enabled=options.time_report is not None)
+
+    @cached_property
+    def source(self) -> str:
+        # Preprocessed text. #include "..." resolves against base_dir
+        with self.metrics.stage("preprocess"):
+            return preprocess_text(self.text, self.base_dir, self.options)
+
+    @cached_property
+    def tokens(self):
+        from .lexer import Lexer
+        with self.metrics.stage("lex"):
+            tokens = Lexer(self.source).lex_buffer()
+        self.metrics.count("tokens", len(tokens))
+        return tokens
+
+    @cached_property
+    def ast(self):
+        from .parser import Parser
+        with self.metrics.stage("parse"):
+            ast = Parser(self.tokens).parse()
+        if self.metrics.enabled:
+            from .metrics import count_nodes
+            self.metrics.count("ast_nodes", count_nodes(ast))
+        return ast
+
+    @cached_property
+    def tacky(self):
+        from .tackygen import TackyGenerator
+        with self.metrics.stage("tacky"):
+            ir = TackyGenerator(self.ast).generate()
+        if self.options.opt_level > 0:
+            from .optimizer import optimize
+            with self.metrics.stage("optimize"):
+                ir = optimize(ir, self.options.opt_level, self.metrics)
+        self.metrics.count("tacky_instructions", len(ir.function.body))
+        return ir
+
+    @cached_property
+    def asm_ir(self):
+        # Final assembly instructions, what the emitter and encoder consume
+        from .driver import lower
+        return lower(self.tacky, NO_PRINT, self.options, self.metrics)
+
+    @cached_property
+    def assembly(self) -> str:
+        from .emitter import Emitter
+        with self.metrics.stage("emit"):
+            emitter = Emitter(self.asm_ir)
+            emitter.emit_program(self.asm_ir)
+        self.metrics.count("bytes_emitted", emitter.stream_emitter.bytes_written)
+        return emitter.get_assembly()
+
+    @cached_property
+    def object_code(self) -> bytes:
+        # Relocatable ELF object from the integrated assembler
+        from .encoder import encode_object
+        with self.metrics.stage("encode"):
+            return encode_object(self.asm_ir)
+
+    def run(self) -> int:
+        # main's return value, executed in this process through the JIT
+        from .jit import run_program
+        with self.metrics.stage("run"):
+            return run_program(self.asm_ir)
+
+    def interpret(self) -> int:
+        # main's return value, from interpreting the TACKY
+        from .interpreter import interpret
+        with self.metrics.stage("interpret"):
+            return interpret(self.tacky)
+
+
+def preprocess_text(text: str, base_dir: Path, options: CompileOptions) -> str:
+    # The built-in preprocessor on in-memory text, gcc -E on a pipe for
+    # input outside its subset
+    if options.builtin_preprocessor:
+        from .preprocessor import Preprocessor
+        try:
+            return Preprocessor().preprocess(text, base_dir)
+        except PreprocessorUnsupported:
+            pass
+    import subprocess
+    try:
+        result = subprocess.run(["gcc", "-E", "-P", "-x", "c", "-"], input=text, cwd=base_dir,
+                                capture_output=True, text=True, check=True)
+    except subprocess.CalledProcessError as e:
+        raise PreprocessorError(e.stderr)
+    return result.stdout
+
+
+def _compile_in_worker(text: str, options: CompileOptions, name: str, base_dir: Path):
+    # Pool task: the result with every stage through assembly filled in, or
+    # None if a stage failed. Compiler errors are not sent back across the
+    # process boundary, the parent compiles the source again to raise them.
+    from .errors import CompilerError
+    result = CompileResult(text, options, name, base_dir)
+    try:
+        result.assembly
+    except CompilerError:
+        return None
+    return result
+
+
+class Compiler:
+    # Reusable compiler: holds the options, recent results keyed by source
+    # text and, once compile_many needs it, a process pool that stays up
+    # until close(). Use as a context manager to shut the pool down.
+    def __init__(self, options: CompileOptions = None, jobs: Optional[int] = None,
+                 cache_size: int = DEFAULT_RESULT_CACHE_SIZE):
+        self.options = options or CompileOptions()
+        self.jobs = jobs
+        self.cache_size = cache_size
+        self.results = OrderedDict()
+        self.pool = None
+
+    def compile_source(self, text: str, name: str = "<source>", base_dir: Optional[Path] = None) -> CompileResult:
+        # Keyed on the resolved directory, #include "..." depends on it
+        base_dir = (base_dir or Path.cwd()).resolve()
+        key = (text, name, base_dir)
+        result = self.results.get(key)
+        if result is None:
+            result = CompileResult(text, self.options, name, base_dir)
+            self.remember(key, result)
+        else:
+            self.results.move_to_end(key)
+        return result
+
+    def compile_file(self, path: Path) -> CompileResult:
+        path = Path(path)
+        return self.compile_source(path.read_text(), str(path), path.parent)
+
+    def compile_many(self, texts: Iterable[str], base_dir: Optional[Path] = None) -> List[CompileResult]:
+        # Compiles sources through assembly in the worker pool. Results come
+        # back in order; one whose compile failed raises when its failing
+        # stage is read, as compile_source's would
+        texts = list(texts)
+        base_dir = (base_dir or Path.cwd()).resolve()
+        if self.pool is None:
+            import os
+            from concurrent.futures import ProcessPoolExecutor
+            self.pool = ProcessPoolExecutor(max_workers=self.jobs or os.cpu_count() or 1)
+        names = [f"<source {index}>" for index in range(len(texts))]
+        futures = [self.pool.submit(_compile_in_worker, text, self.options, name, base_dir)
+                   for text, name in zip(texts, names)]
+        results = []
+        for text, name, future in zip(texts, names, futures):
+            result = future.result()
+            if result is None:
+                results.append(self.compile_source(text, name, base_dir))
+            else:
+                self.remember((text, name, base_dir), result)
+                results.append(result)
+        return results
+
+    def remember(self, key, result: CompileResult):
+        self.results[key] = result
+        self.results.move_to_end(key)
+        while len(self.results) > self.cache_size:
+            self.results.popitem(last=False)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
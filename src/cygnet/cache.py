@@ -0,0 +1,203 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional
+from .enums import CompileStage, CompileOptions, DEFAULT_CACHE_SIZE
+from .print import log_msg
+
+# Content-addressed cache of compiled artifacts (.s files and executables).
+#
+# Artifacts are keyed by a hash of the preprocessed source, the compiler
+# itself and every option that changes the output, so any change to an
+# included header changes the key. Alongside that a per-source manifest
+# records the files the preprocessor read and their hashes; when none of
+# them changed the artifact key is taken from the manifest and even
+# preprocessing is skipped. Least recently used artifacts are evicted once
+# the cache grows past its size cap. Writing to the cache is best effort: a
+# cache directory that can't be written only costs the next compile a miss.
+
+# CompileOptions fields that change generated code, part of every key
+OUTPUT_OPTIONS = ("opt_level", "integrated_as")
+
+ARTIFACT_SUFFIXES = {
+    CompileStage.ASSEMBLE: ".s",
+    CompileStage.OBJECT: ".o",
+    CompileStage.LINK: "",
+}
+
+
+def default_cache_dir() -> Path:
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "cygnet"
+
+
+def artifact_path(path: Path, stage: CompileStage) -> Path:
+    return path.with_suffix(ARTIFACT_SUFFIXES[stage])
+
+
+@lru_cache(maxsize=1)
+def compiler_fingerprint() -> str:
+    # Hash of the compiler's own sources, so editing any pass invalidates
+    # everything it produced before
+    digest = hashlib.sha256()
+    for module in sorted(Path(__file__).parent.glob("*.py")):
+        digest.update(module.name.encode())
+        digest.update(module.read_bytes())
+    return digest.hexdigest()
+
+
+def _hash_file(path: Path) -> Optional[str]:
+    try:
+        return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+    except OSError:
+        return None
+
+
+class CompilationCache:
+    def __init__(self, directory: Path, max_size: int = DEFAULT_CACHE_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+        self.objects_dir = directory / "objects"
+        self.manifests_dir = directory / "manifests"
+        # Bytes in objects_dir, scanned on the first store and kept current
+        # after that, so a batch doesn't re-scan the cache per artifact
+        self.size: Optional[int] = None
+
+    # Keys
+
+    def _options_key(self, stage: CompileStage, options: CompileOptions) -> str:
+        values = [stage.name] + [f"{name}={getattr(options, name)!r}" for name in OUTPUT_OPTIONS]
+        return ";".join(values)
+
+    def key(self, source: str, stage: CompileStage, options: CompileOptions) -> str:
+        digest = hashlib.sha256()
+        digest.update(compiler_fingerprint().encode())
+        digest.update(self._options_key(stage, options).encode())
+        digest.update(b"\0")
+        digest.update(source.encode())
+        return digest.hexdigest()
+
+    def _manifest_file(self, path: Path, stage: CompileStage, options: CompileOptions) -> Path:
+        digest = hashlib.sha256()
+        digest.update(compiler_fingerprint().encode())
+        digest.update(self._options_key(stage, options).encode())
+        digest.update(str(path.resolve()).encode())
+        return self.manifests_dir / f"{digest.hexdigest()}.json"
+
+    def _object_file(self, key: str, stage: CompileStage) -> Path:
+        return self.objects_dir / key[:2] / f"{key}{ARTIFACT_SUFFIXES[stage]}"
+
+    # Artifacts
+
+    def fetch(self, key: str, stage: CompileStage, destination: Path) -> bool:
+        # Copy a cached artifact to destination, returns False on a miss
+        cached = self._object_file(key, stage)
+        try:
+            shutil.copyfile(cached, destination)
+            shutil.copymode(cached, destination)
+            # Mark as recently used for LRU eviction
+            os.utime(cached)
+        except OSError:
+            return False
+        return True
+
+    def store(self, key: str, stage: CompileStage, artifact: Path):
+        cached = self._object_file(key, stage)
+        tmp_name = None
+        try:
+            cached.parent.mkdir(parents=True, exist_ok=True)
+            # Write then rename so parallel compiles never see a partial file
+            fd, tmp_name = tempfile.mkstemp(dir=cached.parent)
+            os.close(fd)
+            shutil.copyfile(artifact, tmp_name)
+            shutil.copymode(artifact, tmp_name)
+            os.replace(tmp_name, cached)
+            size = cached.stat().st_size
+        except OSError as e:
+            log_msg("WARNING", "Not caching %s: %s", artifact, e)
+            if tmp_name is not None and os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+            return
+        if self.size is None:
+            self.size = self._scan_size()
+        else:
+            self.size += size
+        if self.size > self.max_size:
+            self.evict()
+
+    # Manifests of preprocessor dependencies
+
+    def lookup_manifest(self, path: Path, stage: CompileStage, options: CompileOptions) -> Optional[str]:
+        try:
+            manifest = json.loads(self._manifest_file(path, stage, options).read_text())
+        except (OSError, ValueError):
+            return None
+        for dependency, expected in manifest["dependencies"].items():
+            if _hash_file(dependency) != expected:
+                return None
+        return manifest["key"]
+
+    def store_manifest(self, path: Path, stage: CompileStage, options: CompileOptions, dependencies: List[Path], key: str):
+        hashes: Dict[str, str] = {}
+        for dependency in dependencies:
+            digest = _hash_file(dependency)
+            if digest is None:
+                return
+            hashes[str(Path(dependency).resolve())] = digest
+        manifest_file = self._manifest_file(path, stage, options)
+        tmp_name = None
+        try:
+            manifest_file.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(dir=manifest_file.parent)
+            with os.fdopen(fd, "w") as f:
+                json.dump({"dependencies": hashes, "key": key}, f)
+            os.replace(tmp_name, manifest_file)
+        except OSError as e:
+            log_msg("WARNING", "Not caching dependencies of %s: %s", path, e)
+            if tmp_name is not None and os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+
+    # Eviction
+
+    def _entries(self):
+        # (mtime, size, path) of every cached artifact
+        entries = []
+        for cached in self.objects_dir.glob("*/*"):
+            try:
+                stat = cached.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, cached))
+        return entries
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        # Drop least recently used artifacts until the cache fits its cap.
+        # Only called once the running size is over the cap; the scan also
+        # corrects it for artifacts other processes stored or replaced
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        entries.sort()
+        for _, size, cached in entries:
+            if total <= self.max_size:
+                break
+            try:
+                cached.unlink()
+            except OSError:
+                continue
+            total -= size
+        self.size = total
+
+
+@lru_cache(maxsize=None)
+def shared_cache(directory: Path, max_size: int = DEFAULT_CACHE_SIZE) -> CompilationCache:
+    # One CompilationCache per directory in a process, so its running size
+    # carries over between the files of a batch, a watch session or server
+    # requests
+    return CompilationCache(directory, max_size)
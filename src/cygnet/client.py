@@ -0,0 +1,68 @@
+import json
+import os
+import socket
+import sys
+import tempfile
+from pathlib import Path
+
+# Thin client for the compile server (cygnet.server). Takes exactly the
+# arguments cygnet does, forwards them with the working directory and
+# prints the server's output, exiting with its status. Only the standard
+# library is imported so a call costs little more than interpreter start.
+# With no server listening the command is compiled in this process instead.
+
+SOCKET_ENV = "CYGNET_SOCKET"
+
+# Options that keep running and print as they go, the server would hold a
+# worker forever and the output would never arrive. Always run here.
+LOCAL_ONLY_OPTIONS = ("--watch",)
+
+
+def default_socket_path() -> Path:
+    if os.environ.get(SOCKET_ENV):
+        return Path(os.environ[SOCKET_ENV])
+    base = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return Path(base) / f"cygnet-{os.getuid()}.sock"
+
+
+def request(argv, socket_path: Path):
+    # Sends one command line, returns (exit code, output). Raises
+    # FileNotFoundError or ConnectionRefusedError when no server is listening
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(str(socket_path))
+        message = {"argv": list(argv), "cwd": os.getcwd()}
+        connection.sendall(json.dumps(message).encode() + b"\n")
+        connection.shutdown(socket.SHUT_WR)
+        chunks = []
+        while chunk := connection.recv(65536):
+            chunks.append(chunk)
+    reply = json.loads(b"".join(chunks))
+    return reply["exit_code"], reply["output"]
+
+
+def runs_locally(argv) -> bool:
+    return any(arg in LOCAL_ONLY_OPTIONS for arg in argv)
+
+
+def compile_locally(argv):
+    from .main import app
+    app(args=list(argv), prog_name="cygnet")
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if runs_locally(argv):
+        compile_locally(argv)
+        return
+    try:
+        exit_code, output = request(argv, default_socket_path())
+    except (FileNotFoundError, ConnectionRefusedError):
+        compile_locally(argv)
+        return
+    sys.stdout.write(output)
+    sys.stdout.flush()
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
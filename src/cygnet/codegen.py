@@ -1,3 +1,4 @@
+import heapq
 from dataclasses import dataclass
 from typing import List
 from enum import Enum, auto
@@ -14,7 +15,14 @@ class TackyAssemblyNode:
 
 class Reg(Enum):
     AX = auto()
+    CX = auto()
+    DX = auto()
+    SI = auto()
+    DI = auto()
+    R8 = auto()
+    R9 = auto()
     R10 = auto()
+    R11 = auto()
 
 
 @dataclass
@@ -222,3 +230,107 @@ class FixingUpInstructions:
             fixed_insns.append(Mov(Register(Reg.R10), asm_insn.op_dst))
             return fixed_insns
         return asm_insn
+
+
+class FusedLowering:
+    # TackyToAssembly, PseudoReplacer, StackSlotColoring and
+    # FixingUpInstructions in a single walk over TACKY: each TACKY
+    # instruction goes straight to its final, stack-resolved and fixed-up
+    # instructions, with operands built once per slot. A temporary's slot is
+    # freed after the instruction that last mentions it, and new temporaries
+    # take the lowest free slot, so the output matches the passes exactly;
+    # they stay in use when the intermediate IR is printed.
+    def __init__(self, tacky_root: tacky.Program):
+        self.tacky_root = tacky_root
+        self.slot_of = {}
+        self.free_slots = []
+        self.slots = 0
+        self.stack_operands = []
+        self.stack_offset = 0
+        self.frame_before = 0
+        self.ax = Register(Reg.AX)
+        self.r10 = Register(Reg.R10)
+        self.unary_ops = {tacky.Complement: Not(), tacky.Negate: Neg()}
+
+    def generate(self):
+        return self.generate_program(self.tacky_root)
+
+    def generate_program(self, tacky_program):
+        function = self.generate_function(tacky_program.function)
+        return Program(function=function)
+
+    def generate_function(self, tacky_function):
+        body = tacky_function.body
+        last_use = self.last_uses(body)
+        # The frame size is only known at the end, the placeholder is patched
+        allocate = AllocateStack(0)
+        instructions = [allocate]
+        append = instructions.append
+        for index, tacky_insn in enumerate(body):
+            if isinstance(tacky_insn, tacky.Unary):
+                src = self.convert_val(tacky_insn.src)
+                # A source read for the last time here hands its slot on, the
+                # copy into dst reads it before dst is written
+                if tacky_insn.src != tacky_insn.dst:
+                    self.release(tacky_insn.src, index, last_use)
+                dst = self.convert_val(tacky_insn.dst)
+                if src is dst:
+                    pass
+                elif isinstance(src, Stack) and isinstance(dst, Stack):
+                    append(Mov(src, self.r10))
+                    append(Mov(self.r10, dst))
+                else:
+                    append(Mov(src, dst))
+                append(Unary(self.convert_unary_op(tacky_insn.unary_op), dst))
+                self.release(tacky_insn.dst, index, last_use)
+            elif isinstance(tacky_insn, tacky.Return):
+                append(Mov(self.convert_val(tacky_insn.val), self.ax))
+                append(Ret())
+            else:
+                raise TackyAssemblyError("Error processing instruction from TACKY", tacky_insn)
+        self.frame_before = 4 * len(self.slot_of)
+        self.stack_offset = -4 * self.slots
+        allocate.value = self.stack_offset
+        return Function(tacky_function.identifier, instructions)
+
+    def last_uses(self, body):
+        # Var identifier -> index of the last instruction mentioning it
+        last_use = {}
+        for index, tacky_insn in enumerate(body):
+            if isinstance(tacky_insn, tacky.Unary):
+                vals = (tacky_insn.src, tacky_insn.dst)
+            elif isinstance(tacky_insn, tacky.Return):
+                vals = (tacky_insn.val,)
+            else:
+                raise TackyAssemblyError("Error processing instruction from TACKY", tacky_insn)
+            for val in vals:
+                if isinstance(val, tacky.Var):
+                    last_use[val.identifier] = index
+        return last_use
+
+    def release(self, tacky_val, index, last_use):
+        if isinstance(tacky_val, tacky.Var) and last_use[tacky_val.identifier] == index:
+            heapq.heappush(self.free_slots, self.slot_of[tacky_val.identifier])
+
+    def convert_unary_op(self, tacky_unary_op):
+        asm_op = self.unary_ops.get(type(tacky_unary_op))
+        if asm_op is None:
+            raise TackyAssemblyError("Error processing unary operator from TACKY", tacky_unary_op)
+        return asm_op
+
+    def convert_val(self, tacky_val):
+        if isinstance(tacky_val, tacky.Var):
+            slot = self.slot_of.get(tacky_val.identifier)
+            if slot is None:
+                if self.free_slots:
+                    slot = heapq.heappop(self.free_slots)
+                else:
+                    slot = self.slots
+                    self.slots += 1
+                    self.stack_operands.append(Stack(offset=-4 * self.slots))
+                self.slot_of[tacky_val.identifier] = slot
+            return self.stack_operands[slot]
+        elif isinstance(tacky_val, tacky.Constant):
+            return Imm(tacky_val.value)
+        else:
+            raise TackyAssemblyError("Error processing value from TACKY", tacky_val)
@@ -1,182 +1,559 @@
 from pathlib import Path
-import subprocess
+from dataclasses import astuple, replace
+from typing import List, Optional
 import os
-from rich import print
-from .lexer import Lexer
-from .parser import Parser, print_ast_out
-from .codegen import PseudoReplacer, TackyToAssembly, FixingUpInstructions
-from .tackygen import TackyGenerator, print_tacky
-from .print import print_source_code, print_msg, print_error, print_token_list
-from .errors import CompilerError
-from .enums import SUCCESS, FAIL, CompileStage, PrintFlags
-from .emitter import Emitter
+from .print import print, print_msg, print_error, print_source_code, print_token_list, print_batch_summary, print_time_report, log_msg, set_log_level
+from .errors import CompilerError, PreprocessorUnsupported, LinkError
+from .enums import SUCCESS, FAIL, COMPILE_FAILED_STATUS, CompileStage, PrintFlags, CompileOptions
+from .metrics import PipelineMetrics
+
+# Compiler stages, the preprocessor, the cache and subprocess are imported
+# where they are first needed, so e.g. --lex never loads the back end
+
+
+# Stages that execute the program rather than write a file, the driver
+# returns the program's exit status for them
+EXECUTE_STAGES = (CompileStage.RUN, CompileStage.INTERPRET)
+
+# Cap on the processes compile_files starts for a batch, None for no cap.
+# Compile server workers set it to 1: they are already one of a pool, and
+# compiling in-process keeps their output captured and their state warm
+max_jobs: Optional[int] = None
+
+
+def set_max_jobs(jobs: Optional[int]):
+    global max_jobs
+    max_jobs = jobs
 
 
 # Compiler driver functions
 
-def compile_driver(path: Path, stage: CompileStage, print_flags: PrintFlags):
+def compile_driver(path: Path, stage: CompileStage, print_flags: PrintFlags, options: CompileOptions = None):
+
+    if options is None:
+        options = CompileOptions()
+    set_log_level("INFO" if options.verbose else "WARNING")
+
+    cache = open_cache(stage, print_flags, options)
+
+    # Unchanged source and headers: reuse the artifact without preprocessing
+    if cache is not None:
+        key = cache.lookup_manifest(path, stage, options)
+        if key is not None and cache.fetch(key, stage, output_path(path, stage, options)):
+            log_msg("INFO", "Cache hit : %s", path)
+            return SUCCESS
+
+    metrics = PipelineMetrics(str(path), enabled=options.time_report is not None)
 
     # Preprocess file, bug out if failure
     # TODO: improve preprocess file error generation
-    if preprocess_file(path) != SUCCESS:
-        return FAIL
+    with metrics.stage("preprocess"):
+        source, dependencies = preprocess(path, options)
+    if source is None:
+        return failed(stage)
+
+    return compile_preprocessed(path, source, dependencies, stage, print_flags, options, cache, metrics)
+
+
+def compile_preprocessed(path: Path, source: str, dependencies, stage: CompileStage, print_flags: PrintFlags,
+                         options: CompileOptions, cache, metrics: PipelineMetrics):
+    # The rest of compile_driver once the source is preprocessed: reuse a
+    # cached artifact for this exact text or run the pipeline and store it
+
+    if cache is not None:
+        key = cache.key(source, stage, options)
+        if cache.fetch(key, stage, output_path(path, stage, options)):
+            log_msg("INFO", "Cache hit : %s", path)
+            if dependencies is not None:
+                cache.store_manifest(path, stage, options, dependencies, key)
+            return SUCCESS
 
     result = SUCCESS
     try:
-        run_pipeline(path, stage, print_flags)
+        value = run_pipeline(path, source, stage, print_flags, options, metrics)
+        if stage in EXECUTE_STAGES:
+            # Like a process exit status, only the low byte of main's result
+            result = value & 0xFF
+        if cache is not None and output_path(path, stage, options).exists():
+            cache.store(key, stage, output_path(path, stage, options))
+            if dependencies is not None:
+                cache.store_manifest(path, stage, options, dependencies, key)
     except CompilerError as e:
         print_error(str(e))
-        result = FAIL
-    finally:
-        cleanup_files(path, stage)
+        result = failed(stage)
+
+    if options.time_report is not None:
+        print_time_report(metrics, options.time_report)
+
+    return result
+
+
+def failed(stage: CompileStage) -> int:
+    # Result of a compile that did not succeed, kept apart from main's
+    # return value when executing
+    return COMPILE_FAILED_STATUS if stage in EXECUTE_STAGES else FAIL
+
+
+def output_path(path: Path, stage: CompileStage, options: CompileOptions):
+    # Where the artifact for a stage goes: -o if given, else next to the source
+    from .cache import ARTIFACT_SUFFIXES
+    if options.output is not None:
+        return options.output
+    return path.with_suffix(ARTIFACT_SUFFIXES[stage])
+
+
+def open_cache(stage: CompileStage, print_flags: PrintFlags, options: CompileOptions):
+    # The cache only holds on-disk artifacts, and a run that prints or times
+    # intermediate stages has to execute them anyway
+    from .cache import shared_cache, ARTIFACT_SUFFIXES, default_cache_dir
+    if (not options.use_cache or stage not in ARTIFACT_SUFFIXES or any(astuple(print_flags))
+            or options.time_report is not None):
+        return None
+    # Resolved, so a process serving several working directories never
+    # shares one instance between different relative --cache-dir paths
+    return shared_cache((options.cache_dir or default_cache_dir()).resolve(), options.cache_max_size)
+
+
+def compile_batch(paths: List[Path], stage: CompileStage, print_flags: PrintFlags, options: CompileOptions = None,
+                  jobs: Optional[int] = None, output: Optional[Path] = None):
+    # Compile many sources across a process pool and return one aggregate
+    # result. With an output path every source is assembled and the results
+    # are linked together into that one executable.
+
+    if options is None:
+        options = CompileOptions()
+    set_log_level("INFO" if options.verbose else "WARNING")
+
+    if stage in EXECUTE_STAGES and (len(paths) > 1 or output is not None):
+        print_error("--run and --interpret take a single source file and no -o")
+        return failed(stage)
+    if stage in EXECUTE_STAGES:
+        # Passes the program's exit status through rather than SUCCESS/FAIL
+        return compile_driver(paths[0], stage, print_flags, options)
+
+    link_together = output is not None and stage == CompileStage.LINK and len(paths) > 1
+    if output is not None and len(paths) > 1 and not link_together:
+        print_error("-o with multiple files is only supported when linking")
+        return FAIL
+    if output is not None and not link_together:
+        options = replace(options, output=output)
+
+    if not link_together:
+        return compile_files(paths, stage, print_flags, [options] * len(paths), jobs)
+
+    import tempfile
+    # With the integrated assembler every source becomes an object file,
+    # otherwise assembly that gcc assembles while linking
+    part_stage, suffix = (CompileStage.OBJECT, ".o") if options.integrated_as else (CompileStage.ASSEMBLE, ".s")
+    with tempfile.TemporaryDirectory(prefix="cygnet-") as temp_dir:
+        # Parts for a combined link go to a private directory, never next to the sources
+        part_files = [Path(temp_dir) / f"{index}{suffix}" for index in range(len(paths))]
+        file_options = [replace(options, output=part_file) for part_file in part_files]
+        result = compile_files(paths, part_stage, print_flags, file_options, jobs)
+        if result == SUCCESS:
+            try:
+                link_assembly(part_files, output)
+            except CompilerError as e:
+                print_error(str(e))
+                result = FAIL
 
     return result
 
 
-def run_pipeline(path: Path, stage: CompileStage, print_flags: PrintFlags):
+def compile_files(paths: List[Path], stage: CompileStage, print_flags: PrintFlags, file_options: List[CompileOptions],
+                  jobs: Optional[int] = None):
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    if max_jobs is not None:
+        jobs = min(jobs, max_jobs)
+
+    if jobs <= 1 or len(paths) == 1:
+        results = [compile_driver(path, stage, print_flags, path_options)
+                   for path, path_options in zip(paths, file_options)]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=min(jobs, len(paths))) as pool:
+            futures = [pool.submit(compile_driver, path, stage, print_flags, path_options)
+                       for path, path_options in zip(paths, file_options)]
+            results = []
+            for path, future in zip(paths, futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    print_error(f"{path}: {e}")
+                    results.append(FAIL)
+
+    if len(paths) > 1:
+        print_batch_summary(list(zip(paths, results)))
+
+    return FAIL if FAIL in results else SUCCESS
+
+
+def run_pipeline(path: Path, source: str, stage: CompileStage, print_flags: PrintFlags, options: CompileOptions,
+                 metrics: Optional[PipelineMetrics] = None):
+
+    if metrics is None:
+        metrics = PipelineMetrics(str(path), enabled=False)
 
-    # 1. Read preprocessed source
-    preproc_file = path.with_suffix(".i")
-    source = read_lines(preproc_file)
+    # 1. Preprocessed source
     if print_flags.source:
         print_source_code(source)
 
     # 2. Lexer
-    print_msg("INFO", "Lexing file...")
+    from .lexer import Lexer
+    log_msg("INFO", "Lexing file...")
     lexer = Lexer(source)
-    tokens = lexer.lex()
-    if print_flags.tokens:
-        print_token_list(tokens)
-    if stage == CompileStage.LEX:
-        return
+    if print_flags.tokens or stage == CompileStage.LEX or metrics.enabled:
+        # Drain the whole stream into a compact buffer when tokens are wanted
+        # on their own, or so lexing and parsing can be timed separately
+        with metrics.stage("lex"):
+            tokens = lexer.lex_buffer()
+        metrics.count("tokens", len(tokens))
+        if print_flags.tokens:
+            print_token_list(tokens)
+        if stage == CompileStage.LEX:
+            return
+    else:
+        # Otherwise the parser pulls tokens as the lexer produces them
+        tokens = lexer.tokenize()
 
     # 3. Parser
-    print_msg("INFO", "Parsing file...")
-    parser = Parser(tokens)
-    ast = parser.parse()
+    from .parser import Parser, print_ast_out
+    log_msg("INFO", "Parsing file...")
+    with metrics.stage("parse"):
+        parser = Parser(tokens)
+        ast = parser.parse()
+    if metrics.enabled:
+        from .metrics import count_nodes
+        metrics.count("ast_nodes", count_nodes(ast))
     if print_flags.ast:
         print_ast_out(ast, 0)
     if stage == CompileStage.PARSE:
         return
 
     # 4. TACKY Generation
-    print_msg("INFO", "Generating TACKY...")
-    tacky_gen = TackyGenerator(ast)
-    ir = tacky_gen.generate()
+    from .tackygen import TackyGenerator, print_tacky
+    log_msg("INFO", "Generating TACKY...")
+    with metrics.stage("tacky"):
+        tacky_gen = TackyGenerator(ast)
+        ir = tacky_gen.generate()
+    if options.opt_level > 0:
+        from .optimizer import optimize
+        log_msg("INFO", "Optimizing TACKY...")
+        with metrics.stage("optimize"):
+            ir = optimize(ir, options.opt_level, metrics)
+    metrics.count("tacky_instructions", len(ir.function.body))
     if print_flags.tacky:
         print_tacky(ir)
     if stage == CompileStage.TACKY:
         return
 
+    # 4b. --interpret: execute the TACKY directly, no back end at all
+    if stage == CompileStage.INTERPRET:
+        from .interpreter import interpret
+        log_msg("INFO", "Interpreting main...")
+        with metrics.stage("interpret"):
+            value = interpret(ir)
+        log_msg("INFO", "main returned %d", value)
+        return value
+
     # 5. Code Generation
-    print_msg("INFO", "Generating Assembly...")
-    codegen = TackyToAssembly(ir)
-    codegen_ir = codegen.generate()
+    log_msg("INFO", "Generating Assembly...")
+    codegen_fu_ir = lower(ir, print_flags, options, metrics)
+
+    # 5b. Emit assembly. Text that is printed or used more than once is
+    # built in memory, otherwise it is streamed to the .s file or straight
+    # into the assembler
+    from .emitter import StreamEmitter
+    assembly = None
+    if print_flags.asm or stage == CompileStage.CODEGEN or options.save_temps:
+        import io
+        with metrics.stage("emit"):
+            buffer = io.StringIO()
+            emitter = StreamEmitter(buffer)
+            emitter.emit_program(codegen_fu_ir)
+            emitter.flush()
+            assembly = buffer.getvalue()
+        metrics.count("bytes_emitted", emitter.bytes_written)
+
+        if print_flags.asm:
+            print("\n")
+            print_msg("INFO", "Printing Assembly:")
+            print(assembly)
+        if stage == CompileStage.CODEGEN:
+            return
+
+        # 6. Write Assembly File, only when asked for with -S or --save-temps
+        if stage == CompileStage.ASSEMBLE or options.save_temps:
+            log_msg("INFO", "Writing assembly file...")
+            asm_file = output_path(path, CompileStage.ASSEMBLE, options) if stage == CompileStage.ASSEMBLE else path.with_suffix(".s")
+            with metrics.stage("write"):
+                asm_file.write_text(assembly)
+        if stage == CompileStage.ASSEMBLE:
+            return
+    elif stage == CompileStage.ASSEMBLE:
+        log_msg("INFO", "Writing assembly file...")
+        with metrics.stage("emit"):
+            with open(output_path(path, stage, options), "w") as asm_stream:
+                emitter = StreamEmitter(asm_stream)
+                emitter.emit_program(codegen_fu_ir)
+                emitter.flush()
+        metrics.count("bytes_emitted", emitter.bytes_written)
+        return
+
+    # 7. --run: execute main in this process instead of producing a file
+    if stage == CompileStage.RUN:
+        from .jit import run_program
+        log_msg("INFO", "Running main...")
+        with metrics.stage("run"):
+            value = run_program(codegen_fu_ir)
+        log_msg("INFO", "main returned %d", value)
+        return value
+
+    # 8. Object code and linking
+    output = output_path(path, stage, options)
+    if options.integrated_as:
+        # Machine code and the ELF object are built here, gcc only links
+        from .encoder import encode_object
+        with metrics.stage("encode"):
+            object_code = encode_object(codegen_fu_ir)
+        metrics.count("object_bytes", len(object_code))
+        if stage == CompileStage.OBJECT:
+            log_msg("INFO", "Writing object file...")
+            with metrics.stage("write"):
+                output.write_bytes(object_code)
+        else:
+            with metrics.stage("link"):
+                link_object(object_code, output)
+    elif assembly is not None:
+        # Assembly is piped straight into the assembler
+        with metrics.stage("link"):
+            link_file(assembly, output, stage)
+    else:
+        with metrics.stage("emit_link"):
+            emitter = link_program(codegen_fu_ir, output, stage)
+        metrics.count("bytes_emitted", emitter.bytes_written)
+    return
+
+
+def lower(ir, print_flags: PrintFlags, options: CompileOptions, metrics: PipelineMetrics):
+    # TACKY to final assembly instructions for options.opt_level
+    if options.opt_level == 0 and not print_flags.ir:
+        # Straight to final instructions in one walk
+        from .codegen import FusedLowering
+        with metrics.stage("lower"):
+            lowering = FusedLowering(ir)
+            codegen_fu_ir = lowering.generate()
+        metrics.count("stack_frame_bytes_before", lowering.frame_before)
+        metrics.count("stack_frame_bytes", abs(lowering.stack_offset))
+        log_msg("INFO", "Stack frame %d -> %d bytes", lowering.frame_before, abs(lowering.stack_offset))
+        metrics.count("asm_instructions", len(codegen_fu_ir.function.instructions))
+    else:
+        codegen_fu_ir = lower_in_passes(ir, print_flags, options, metrics)
+
+    if options.opt_level > 0:
+        from .peephole import PeepholeOptimizer
+        with metrics.stage("peephole"):
+            peephole = PeepholeOptimizer(codegen_fu_ir)
+            codegen_fu_ir = peephole.optimize()
+        for name, removed in peephole.removed.items():
+            metrics.count(f"peephole.{name}", removed)
+        log_msg("INFO", "Peephole removed %d instructions", peephole.total_removed())
+        metrics.count("asm_instructions", len(codegen_fu_ir.function.instructions))
+        if print_flags.ir:
+            print("\n")
+            print_msg("INFO", "Printing Peephole Optimized IR:")
+            print(codegen_fu_ir)
+    return codegen_fu_ir
+
+
+def lower_in_passes(ir, print_flags: PrintFlags, options: CompileOptions, metrics: PipelineMetrics):
+    # TACKY to assembly as separate passes, so each intermediate IR can be
+    # printed and -O1 can swap in register allocation
+    from .codegen import PseudoReplacer, TackyToAssembly, FixingUpInstructions
+    with metrics.stage("codegen"):
+        codegen = TackyToAssembly(ir)
+        codegen_ir = codegen.generate()
     if print_flags.ir:
         print("\n")
         print_msg("INFO", "Printing IR:")
         print(codegen_ir)
-    codegen_pr = PseudoReplacer(codegen_ir)
-    codegen_pr_ir = codegen_pr.replace()
+    if options.opt_level > 0:
+        # Keep pseudos in registers, spilling only when they run out
+        from .regalloc import RegisterAllocator
+        with metrics.stage("regalloc"):
+            codegen_pr = RegisterAllocator(codegen_ir)
+            codegen_pr_ir = codegen_pr.replace()
+        metrics.count("spilled_pseudos", codegen_pr.spilled)
+    else:
+        with metrics.stage("pseudo_replace"):
+            codegen_pr = PseudoReplacer(codegen_ir)
+            codegen_pr_ir = codegen_pr.replace()
+    # Values left on the stack share slots when their lifetimes don't overlap
+    from .regalloc import StackSlotColoring
+    with metrics.stage("slot_coloring"):
+        coloring = StackSlotColoring(codegen_pr_ir)
+        codegen_pr_ir = coloring.replace()
+    metrics.count("stack_frame_bytes_before", coloring.frame_before)
+    log_msg("INFO", "Stack frame %d -> %d bytes", coloring.frame_before, coloring.frame_after)
+    metrics.count("stack_frame_bytes", abs(codegen_pr_ir.function.stack_offset))
     if print_flags.ir:
         print("\n")
         print_msg("INFO", "Printing Pseudo Replaced IR:")
         print(codegen_pr_ir)
 
-    codegen_fu = FixingUpInstructions(codegen_pr_ir)
-    codegen_fu_ir = codegen_fu.replace()
+    with metrics.stage("fix_up"):
+        codegen_fu = FixingUpInstructions(codegen_pr_ir)
+        codegen_fu_ir = codegen_fu.replace()
+    metrics.count("asm_instructions", len(codegen_fu_ir.function.instructions))
     if print_flags.ir:
         print("\n")
         print_msg("INFO", "Printing Fixed Up Instructions IR:")
         print(codegen_fu_ir)
-        
-    # 5b. Emit assembly text
-    emitter = Emitter(codegen_fu_ir)
-    emitter.emit_program(codegen_fu_ir)
-    assembly = emitter.get_assembly()
-    
-    if print_flags.asm:
-        print("\n")
-        print_msg("INFO", "Printing Assembly:")
-        print(assembly)
-    if stage == CompileStage.CODEGEN:
-        return
+    return codegen_fu_ir
 
-    # 6. Write Assembly File (needed for ASSEMBLE & LINK)
-    print_msg("INFO", "Writing assembly file...")
-    asm_file = path.with_suffix(".s")
-    asm_file.write_text(assembly)
-    if stage == CompileStage.ASSEMBLE:
-        return
-    
-    # 7. Link
-    link_file(path)
-    return
-        
-
-def cleanup_files(path: Path, stage: CompileStage):
-    # Always delete .i
-    preproc_file = path.with_suffix(".i")
-    if preproc_file.exists():
-        print_msg("INFO", "Deleting preprocessed file...")
-        preproc_file.unlink()
-
-    # Delete .s unless we stopped at ASSEMBLE or CODEGEN
-    if stage not in (CompileStage.ASSEMBLE, CompileStage.CODEGEN):
-        asm_file = path.with_suffix(".s")
-        if asm_file.exists():
-            print_msg("INFO", "Deleting assembly file...")
-            asm_file.unlink()
-
-        
-def preprocess_file(path: Path):
 
-    source_file = path
-    preproc_file = path.with_suffix(".i")
+def preprocess(path: Path, options: CompileOptions):
+    # Returns the preprocessed source text and the files it was built from,
+    # or (None, None) if preprocessing failed. The built-in preprocessor feeds
+    # the lexer directly, gcc -E is only spawned for input it cannot handle.
+    source, dependencies = None, None
+    if options.builtin_preprocessor:
+        log_msg("INFO", "Preprocessing file (built-in) : %s", path)
+        from .preprocessor import Preprocessor
+        preprocessor = Preprocessor()
+        try:
+            source, dependencies = preprocessor.preprocess_file(path), preprocessor.dependencies
+        except PreprocessorUnsupported as e:
+            log_msg("INFO", "%s, falling back to gcc", e)
+
+    if source is None:
+        source, dependencies = preprocess_file(path)
+
+    if source is not None and options.save_temps:
+        path.with_suffix(".i").write_text(source)
+    return source, dependencies
 
-    print_msg("INFO", f"Preprocessing file : {path}") 
 
+def preprocess_file(path: Path):
+    # Run gcc -E and capture its output from stdout, the dependency list
+    # goes to a private temporary file
+    import subprocess
+    import tempfile
+    log_msg("INFO", "Preprocessing file : %s", path)
+
+    fd, dep_file = tempfile.mkstemp(suffix=".d", prefix="cygnet-")
+    os.close(fd)
     try:
         result = subprocess.run(
-            ["gcc", "-E", "-P", source_file, "-o", preproc_file],
+            ["gcc", "-E", "-P", "-MD", "-MF", dep_file, path],
             capture_output=True,
             text=True,
             check=True
         )
     except subprocess.CalledProcessError as e:
         print_error(f"Preprocessing failed : {e.stderr}")
-        return 1
-
-    return 0
-
-
-def read_lines(path: Path):
-    with open(path, 'r') as f:
-        lines = f.readlines()
-
-    stripped_lines = [line.strip() for line in lines]
-
-    return stripped_lines
-
-
-def link_file(path: Path):
+        return None, None
+    finally:
+        dependencies = read_dependencies(Path(dep_file))
 
-    assembly_file = path.with_suffix(".s")
-    output_executable = path.with_suffix("")
+    return result.stdout, dependencies
 
-    print_msg("INFO", f"Linking file : {assembly_file}")
 
+def read_dependencies(path: Path):
+    # Parse (and remove) a make-style dependency file written by gcc -MD
     try:
-        result = subprocess.run(
-            ["gcc", assembly_file, "-o", output_executable],
+        text = path.read_text()
+    except OSError:
+        return None
+    finally:
+        if path.exists():
+            path.unlink()
+    _, _, prerequisites = text.replace("\\\n", " ").partition(":")
+    return [Path(name) for name in prerequisites.split()] or None
+
+
+def assembler_command(stage: CompileStage, output: Path):
+    # gcc reading assembly from stdin: -c stops at the object file
+    compile_only = ["-c"] if stage == CompileStage.OBJECT else []
+    return ["gcc", *compile_only, "-x", "assembler", "-", "-o", output]
+
+
+def link_file(assembly: str, output: Path, stage: CompileStage = CompileStage.LINK):
+    # Assemble (and link) from stdin, no .s file on disk
+    log_msg("INFO", "Linking to : %s", output)
+    run_linker(assembler_command(stage, output), assembly)
+    log_msg("INFO", "Output generated : %s", output)
+
+
+def link_program(program, output: Path, stage: CompileStage = CompileStage.LINK):
+    # Emits the program straight into the assembler's stdin, the assembly
+    # text is never held in memory as a whole
+    import subprocess
+    import tempfile
+    from .emitter import StreamEmitter
+    log_msg("INFO", "Linking to : %s", output)
+    # stderr goes to a file so a chatty assembler can't fill a pipe and stall
+    # while we are still writing its input
+    with tempfile.TemporaryFile() as errors:
+        process = subprocess.Popen(
+            assembler_command(stage, output),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=errors,
+        )
+        emitter = StreamEmitter(process.stdin)
+        try:
+            emitter.emit_program(program)
+            emitter.flush()
+        except BrokenPipeError:
+            # The assembler exited early, its stderr says why
+            pass
+        except BaseException:
+            # Emitting failed: don't leave the assembler running on partial
+            # input, or a zombie behind
+            process.kill()
+            raise
+        finally:
+            try:
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+            process.wait()
+        if process.returncode != 0:
+            errors.seek(0)
+            raise LinkError(errors.read().decode(errors="replace"))
+    log_msg("INFO", "Output generated : %s", output)
+    return emitter
+
+
+def link_object(object_code: bytes, output_executable: Path):
+    # Links an object built by the integrated assembler, only the linker runs
+    import tempfile
+    log_msg("INFO", "Linking to : %s", output_executable)
+    with tempfile.TemporaryDirectory(prefix="cygnet-") as temp_dir:
+        object_file = Path(temp_dir) / "out.o"
+        object_file.write_bytes(object_code)
+        run_linker(["gcc", object_file, "-o", output_executable])
+    log_msg("INFO", "Output executable generated : %s", output_executable)
+
+
+def link_assembly(assembly_files: List[Path], output_executable: Path):
+
+    log_msg("INFO", "Linking files : %s", ", ".join(str(f) for f in assembly_files))
+    run_linker(["gcc", *assembly_files, "-o", output_executable])
+    log_msg("INFO", "Output executable generated : %s", output_executable)
+
+
+def run_linker(command, stdin_text=None):
+    import subprocess
+    try:
+        subprocess.run(
+            command,
+            input=stdin_text,
             capture_output=True,
             text=True,
             check=True
         )
     except subprocess.CalledProcessError as e:
-        print(f"Linking failed:\n{e.stderr}")
-        return 1
-
-    print_msg("INFO", f"Output executable generated : {output_executable}")
-    
-    return 0
+        raise LinkError(e.stderr)
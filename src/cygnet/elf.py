@@ -0,0 +1,111 @@
+import struct
+from typing import Dict, Tuple
+
+# Minimal relocatable ELF64 (x86-64, little endian) object writer. The
+# object carries one .text section, an empty .note.GNU-stack so the linked
+# program keeps a non-executable stack, and a symbol table with a global
+# symbol per function. No relocations: generated code references nothing
+# outside its own function.
+
+ET_REL = 1
+EM_X86_64 = 62
+
+SHT_NULL = 0
+SHT_PROGBITS = 1
+SHT_SYMTAB = 2
+SHT_STRTAB = 3
+
+SHF_ALLOC = 0x2
+SHF_EXECINSTR = 0x4
+
+STB_LOCAL = 0
+STB_GLOBAL = 1
+STT_NOTYPE = 0
+STT_SECTION = 3
+
+ELF_HEADER_SIZE = 64
+SECTION_HEADER_SIZE = 64
+SYMBOL_SIZE = 24
+
+# Section header indexes, in the order the headers are written
+TEXT_INDEX = 1
+NOTE_INDEX = 2
+SYMTAB_INDEX = 3
+STRTAB_INDEX = 4
+SHSTRTAB_INDEX = 5
+SECTION_COUNT = 6
+
+
+class StringTable:
+    # ELF string table, offset 0 is the empty string
+    def __init__(self):
+        self.data = bytearray(b"\0")
+        self.offsets: Dict[str, int] = {"": 0}
+
+    def add(self, name: str) -> int:
+        if name not in self.offsets:
+            self.offsets[name] = len(self.data)
+            self.data += name.encode() + b"\0"
+        return self.offsets[name]
+
+
+def section_header(name, type, flags=0, offset=0, size=0, link=0, info=0, align=1, entsize=0) -> bytes:
+    return struct.pack("<IIQQQQIIQQ", name, type, flags, 0, offset, size, link, info, align, entsize)
+
+
+def symbol(name, binding, type, section, value=0, size=0) -> bytes:
+    return struct.pack("<IBBHQQ", name, (binding << 4) | type, 0, section, value, size)
+
+
+def align_to(data: bytearray, alignment: int):
+    data += b"\0" * (-len(data) % alignment)
+
+
+def build_object(text: bytes, symbols: Dict[str, Tuple[int, int]]) -> bytes:
+    # symbols maps each function name to its (offset, size) within text
+    shstrtab = StringTable()
+    strtab = StringTable()
+
+    # Locals first: the null symbol and the .text section symbol, as as does
+    symtab = bytearray(symbol(0, STB_LOCAL, STT_NOTYPE, 0))
+    symtab += symbol(0, STB_LOCAL, STT_SECTION, TEXT_INDEX)
+    first_global = 2
+    for name, (offset, _) in symbols.items():
+        # Untyped and unsized, what as writes for a label without .type/.size
+        symtab += symbol(strtab.add(name), STB_GLOBAL, STT_NOTYPE, TEXT_INDEX, offset, 0)
+
+    names = {index: shstrtab.add(name) for index, name in (
+        (TEXT_INDEX, ".text"),
+        (NOTE_INDEX, ".note.GNU-stack"),
+        (SYMTAB_INDEX, ".symtab"),
+        (STRTAB_INDEX, ".strtab"),
+        (SHSTRTAB_INDEX, ".shstrtab"),
+    )}
+
+    body = bytearray(b"\0" * ELF_HEADER_SIZE)
+    text_offset = len(body)
+    body += text
+    align_to(body, 8)
+    symtab_offset = len(body)
+    body += symtab
+    strtab_offset = len(body)
+    body += strtab.data
+    shstrtab_offset = len(body)
+    body += shstrtab.data
+    align_to(body, 8)
+    section_offset = len(body)
+
+    body += section_header(0, SHT_NULL, align=0)
+    body += section_header(names[TEXT_INDEX], SHT_PROGBITS, SHF_ALLOC | SHF_EXECINSTR, text_offset, len(text))
+    body += section_header(names[NOTE_INDEX], SHT_PROGBITS, 0, symtab_offset, 0)
+    body += section_header(names[SYMTAB_INDEX], SHT_SYMTAB, 0, symtab_offset, len(symtab),
+                           link=STRTAB_INDEX, info=first_global, align=8, entsize=SYMBOL_SIZE)
+    body += section_header(names[STRTAB_INDEX], SHT_STRTAB, 0, strtab_offset, len(strtab.data))
+    body += section_header(names[SHSTRTAB_INDEX], SHT_STRTAB, 0, shstrtab_offset, len(shstrtab.data))
+
+    header = b"\x7fELF" + bytes([2, 1, 1, 0]) + b"\0" * 8
+    header += struct.pack("<HHIQQQIHHHHHH",
+                          ET_REL, EM_X86_64, 1, 0, 0, section_offset, 0,
+                          ELF_HEADER_SIZE, 0, 0, SECTION_HEADER_SIZE, SECTION_COUNT, SHSTRTAB_INDEX)
+    body[:ELF_HEADER_SIZE] = header
+    return bytes(body)
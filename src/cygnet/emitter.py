@@ -1,75 +1,157 @@
+import io
 from .errors import TackyAssemblyError
-from .codegen import Program, Ret, Mov, Imm, Register, AllocateStack, Unary, UnaryOperator, Neg, Not, Stack, Reg
+from .codegen import Program, Ret, Mov, Imm, Register, AllocateStack, Unary, Neg, Not, Stack, Reg
+
+# 32-bit names, every operation is on int
+REGISTER_NAMES = {
+    Reg.AX: "%eax",
+    Reg.CX: "%ecx",
+    Reg.DX: "%edx",
+    Reg.SI: "%esi",
+    Reg.DI: "%edi",
+    Reg.R8: "%r8d",
+    Reg.R9: "%r9d",
+    Reg.R10: "%r10d",
+    Reg.R11: "%r11d",
+}
+
+UNARY_MNEMONICS = {
+    Neg: "negl",
+    Not: "notl",
+}
+
+INDENT = " " * 4
+
+# Flush to the stream once this many characters are buffered
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+class StreamEmitter:
+    # Writes AT&T assembly straight to a text or binary stream (a file, a
+    # pipe, io.StringIO) in chunks of about chunk_size characters, so memory
+    # use does not grow with the program. Instructions and operands are
+    # dispatched on their exact class through tables built once, and operand
+    # text is cached, so e.g. "%eax" or "-4(%rbp)" is formatted only once.
+    # Lines are separated by newlines with none after the last, the same
+    # text Emitter.get_assembly() has always returned.
+    def __init__(self, stream, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.stream = stream
+        self.binary = not isinstance(stream, io.TextIOBase)
+        self.chunk_size = chunk_size
+        self.pending = []
+        self.pending_size = 0
+        self.started = False
+        self.bytes_written = 0
+        self.instruction_emitters = {
+            Ret: self.emit_ret,
+            Mov: self.emit_mov,
+            Unary: self.emit_unary,
+            AllocateStack: self.emit_allocate_stack,
+        }
+        self.operand_formatters = {
+            Imm: self.format_imm,
+            Register: self.format_register,
+            Stack: self.format_stack,
+        }
+        self.imm_cache = {}
+        self.stack_cache = {}
+
+    def emit_program(self, program: Program):
+        self.emit_function(program.function)
+        self.line("# Confirm code does not require executable stack")
+        self.line(".section .note.GNU-stack,\"\",@progbits")
+
+    def emit_function(self, function):
+        self.line(f"{INDENT}.globl {function.name}")
+        self.line(f"{function.name}:")
+        self.line(f"{INDENT}pushq %rbp")
+        self.line(f"{INDENT}movq %rsp, %rbp")
+        emitters = self.instruction_emitters
+        for instruction in function.instructions:
+            emit = emitters.get(type(instruction))
+            if emit is None:
+                raise TackyAssemblyError("Unexpected instruction type", instruction)
+            emit(instruction)
+
+    # Instructions
+
+    def emit_ret(self, instruction):
+        self.line(f"{INDENT}movq %rbp, %rsp")
+        self.line(f"{INDENT}popq %rbp")
+        self.line(f"{INDENT}ret")
+
+    def emit_mov(self, instruction):
+        self.line(f"{INDENT}movl {self.operand(instruction.op_src)}, {self.operand(instruction.op_dst)}")
+
+    def emit_unary(self, instruction):
+        mnemonic = UNARY_MNEMONICS.get(type(instruction.unary_op))
+        if mnemonic is None:
+            raise TackyAssemblyError("Unexpected unary operator", instruction.unary_op)
+        self.line(f"{INDENT}{mnemonic} {self.operand(instruction.operand)}")
+
+    def emit_allocate_stack(self, instruction):
+        # The stack size is stored as a negative offset, subq takes its magnitude
+        self.line(f"{INDENT}subq ${abs(instruction.value)}, %rsp")
+
+    # Operands
+
+    def operand(self, operand):
+        formatter = self.operand_formatters.get(type(operand))
+        if formatter is None:
+            raise TackyAssemblyError(f"Unexpected operand type", operand)
+        return formatter(operand)
+
+    def format_imm(self, operand):
+        text = self.imm_cache.get(operand.value)
+        if text is None:
+            text = self.imm_cache[operand.value] = f"${operand.value}"
+        return text
+
+    def format_register(self, operand):
+        name = REGISTER_NAMES.get(operand.reg)
+        if name is None:
+            raise TackyAssemblyError(f"Unexpected register type", operand.reg)
+        return name
+
+    def format_stack(self, operand):
+        text = self.stack_cache.get(operand.offset)
+        if text is None:
+            text = self.stack_cache[operand.offset] = f"{operand.offset}(%rbp)"
+        return text
+
+    # Buffering
+
+    def line(self, text: str):
+        self.pending.append(text)
+        self.pending_size += len(text) + 1
+        if self.pending_size >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        chunk = "\n".join(self.pending)
+        if self.started:
+            chunk = "\n" + chunk
+        self.started = True
+        self.pending = []
+        self.pending_size = 0
+        encoded = chunk.encode()
+        self.stream.write(encoded if self.binary else chunk)
+        self.bytes_written += len(encoded)
 
 
 class Emitter:
+    # In-memory front end to StreamEmitter for callers that want the whole
+    # assembly text as a string
     def __init__(self, code_root: Program):
         self.code_root = code_root
-        self.assembly_lines = []
-        self.indent = 4
+        self.buffer = io.StringIO()
+        self.stream_emitter = StreamEmitter(self.buffer)
 
     def emit_program(self, program):
-        self.emit_function(program.function)
-        self.assembly_lines.append("# Confirm code does not require executable stack")
-        self.assembly_lines.append(".section .note.GNU-stack,\"\",@progbits")
-        
-    def emit_function(self, function):
-        indentation = " "*self.indent 
-        # self.assembly_lines.append(self._emit_comment("Function", function))
-        self.assembly_lines.append(f"{indentation}.globl {function.name}")
-        self.assembly_lines.append(f"{function.name}:")
-        self._emit_insn("pushq", "%rbp")
-        self._emit_insn("movq", "%rsp", "%rbp")
-        for instruction in function.instructions:
-            self.emit_instruction(instruction)
-
-    def emit_instruction(self, instruction):
-        if isinstance(instruction, Ret):
-            self._emit_insn("movq", "%rbp", "%rsp")
-            self._emit_insn("popq", "%rbp")
-            self._emit_insn("ret")
-        elif isinstance(instruction, Mov):
-            self._emit_insn("movl", instruction.op_src, instruction.op_dst)
-        elif isinstance(instruction, Unary):
-            if isinstance(instruction.unary_op, Neg):
-                self._emit_insn("negl", instruction.operand)
-            elif isinstance(instruction.unary_op, Not):
-                self._emit_insn("notl", instruction.operand)
-        elif isinstance(instruction, AllocateStack):
-            # Note here the stack value stored as negative value, need to use abs() given subq
-            self._emit_insn("subq", f"${abs(instruction.value)}", "%rsp")
+        self.stream_emitter.emit_program(program)
+        self.stream_emitter.flush()
 
     def get_assembly(self):
-        return "\n".join(self.assembly_lines)
-
-    def _emit_comment(self, type, object):
-        return f"# {type}: {object}"
-    
-    def _emit_insn(self, mnemonic, *operands):
-        indentation = " "*self.indent
-        formatted_ops = [self._format_operand(op) for op in operands]
-        operands_str = ", ".join(formatted_ops)
-        if operands_str:
-            line = f"{indentation}{mnemonic} {operands_str}"
-        else:
-            line = f"{indentation}{mnemonic}"
-        # self.assembly_lines.append(self._emit_comment("Instruction", formatted_ops))
-        self.assembly_lines.append(line)
-
-    def _format_operand(self, operand):
-        if isinstance(operand, str):
-            return operand
-        elif isinstance(operand, Imm):
-            return f"${operand.value}"
-        elif isinstance(operand, Register):
-            return self._format_register(operand.reg)
-        elif isinstance(operand, Stack):
-            return f"{operand.offset}(%rbp)"
-        raise TackyAssemblyError(f"Unexpected operand type", operand)
-
-    def _format_register(self, register):
-        if register == Reg.AX:
-            return f"%eax"
-        elif register == Reg.R10:
-            return f"%r10d"
-        raise TackyAssemblyError(f"Unexpected register type", register)
+        return self.buffer.getvalue()
@@ -0,0 +1,173 @@
+import struct
+from typing import Dict, Tuple
+from .codegen import Program, Ret, Mov, Imm, Register, AllocateStack, Unary, Neg, Not, Stack, Reg
+from .tokens import constant_value
+from .errors import TackyAssemblyError
+
+# x86-64 machine code for the codegen instruction set, the same bytes GNU as
+# produces for the text Emitter writes. Only what the backend emits is
+# covered: movl between immediates, registers and rbp-relative stack slots,
+# negl/notl, and the fixed prologue, frame allocation and epilogue.
+
+# Hardware register numbers, 8 and up need a REX prefix bit
+REGISTER_CODES = {
+    Reg.AX: 0,
+    Reg.CX: 1,
+    Reg.DX: 2,
+    Reg.SI: 6,
+    Reg.DI: 7,
+    Reg.R8: 8,
+    Reg.R9: 9,
+    Reg.R10: 10,
+    Reg.R11: 11,
+}
+
+RBP = 5
+
+# /digit opcode extension of the F7 group
+UNARY_EXTENSIONS = {
+    Neg: 3,
+    Not: 2,
+}
+
+PUSH_RBP = b"\x55"
+MOV_RSP_RBP = b"\x48\x89\xe5"
+MOV_RBP_RSP = b"\x48\x89\xec"
+POP_RBP = b"\x5d"
+RET = b"\xc3"
+
+
+def imm32(operand: Imm) -> bytes:
+    # Like as, keep the low 32 bits of out of range values
+    try:
+        value = constant_value(str(operand.value))
+    except ValueError:
+        raise TackyAssemblyError("Invalid immediate", operand)
+    return struct.pack("<I", value & 0xFFFFFFFF)
+
+
+def fits_int8(value: int) -> bool:
+    return -128 <= value <= 127
+
+
+class X86Encoder:
+    # Encodes a codegen Program into a .text section. The result is the code
+    # bytes plus each function's (offset, size) for the symbol table.
+    def __init__(self, program: Program):
+        self.program = program
+        self.code = bytearray()
+        self.symbols: Dict[str, Tuple[int, int]] = {}
+        self.instruction_encoders = {
+            Ret: self.encode_ret,
+            Mov: self.encode_mov,
+            Unary: self.encode_unary,
+            AllocateStack: self.encode_allocate_stack,
+        }
+
+    def encode(self) -> bytes:
+        self.encode_function(self.program.function)
+        return bytes(self.code)
+
+    def encode_function(self, function):
+        start = len(self.code)
+        self.code += PUSH_RBP
+        self.code += MOV_RSP_RBP
+        encoders = self.instruction_encoders
+        for instruction in function.instructions:
+            encode = encoders.get(type(instruction))
+            if encode is None:
+                raise TackyAssemblyError("Cannot encode instruction", instruction)
+            encode(instruction)
+        self.symbols[function.name] = (start, len(self.code) - start)
+
+    # Instructions
+
+    def encode_ret(self, instruction):
+        self.code += MOV_RBP_RSP
+        self.code += POP_RBP
+        self.code += RET
+
+    def encode_allocate_stack(self, instruction):
+        # subq $n, %rsp: 48 83 /5 ib, or 48 81 /5 id when n needs 32 bits
+        size = abs(instruction.value)
+        if fits_int8(size):
+            self.code += b"\x48\x83\xec" + struct.pack("<b", size)
+        else:
+            self.code += b"\x48\x81\xec" + struct.pack("<i", size)
+
+    def encode_mov(self, instruction):
+        src, dst = instruction.op_src, instruction.op_dst
+        if isinstance(src, Imm):
+            if isinstance(dst, Register):
+                # B8+r id
+                code = self.register_code(dst)
+                self.rex(b=code >> 3)
+                self.code.append(0xB8 + (code & 7))
+                self.code += imm32(src)
+            elif isinstance(dst, Stack):
+                # C7 /0 id
+                self.code.append(0xC7)
+                self.modrm_stack(0, dst)
+                self.code += imm32(src)
+            else:
+                raise TackyAssemblyError("Cannot encode mov destination", dst)
+        elif isinstance(src, Register):
+            # 89 /r, r/m32 <- r32
+            self.register_or_stack(0x89, self.register_code(src), dst)
+        elif isinstance(src, Stack) and isinstance(dst, Register):
+            # 8B /r, r32 <- m32
+            self.register_or_stack(0x8B, self.register_code(dst), src)
+        else:
+            raise TackyAssemblyError("Cannot encode mov", instruction)
+
+    def encode_unary(self, instruction):
+        # F7 /3 neg, F7 /2 not
+        extension = UNARY_EXTENSIONS.get(type(instruction.unary_op))
+        if extension is None:
+            raise TackyAssemblyError("Cannot encode unary operator", instruction.unary_op)
+        self.register_or_stack(0xF7, extension, instruction.operand)
+
+    # Operand encoding
+
+    def register_code(self, operand: Register) -> int:
+        code = REGISTER_CODES.get(operand.reg)
+        if code is None:
+            raise TackyAssemblyError("Cannot encode register", operand)
+        return code
+
+    def rex(self, r: int = 0, b: int = 0):
+        # Only emitted when an extended register is involved, like as
+        if r or b:
+            self.code.append(0x40 | (r << 2) | b)
+
+    def register_or_stack(self, opcode: int, reg_field: int, rm: object):
+        # opcode with ModRM: reg_field is a register or /digit extension and
+        # rm a register or stack slot
+        if isinstance(rm, Register):
+            rm_code = self.register_code(rm)
+            self.rex(r=reg_field >> 3, b=rm_code >> 3)
+            self.code.append(opcode)
+            self.code.append(0xC0 | ((reg_field & 7) << 3) | (rm_code & 7))
+        elif isinstance(rm, Stack):
+            self.rex(r=reg_field >> 3)
+            self.code.append(opcode)
+            self.modrm_stack(reg_field, rm)
+        else:
+            raise TackyAssemblyError("Cannot encode operand", rm)
+
+    def modrm_stack(self, reg_field: int, operand: Stack):
+        # offset(%rbp): mod 01 with disp8 when it fits, else mod 10 with disp32
+        if fits_int8(operand.offset):
+            self.code.append(0x40 | ((reg_field & 7) << 3) | RBP)
+            self.code += struct.pack("<b", operand.offset)
+        else:
+            self.code.append(0x80 | ((reg_field & 7) << 3) | RBP)
+            self.code += struct.pack("<i", operand.offset)
+
+
+def encode_object(program: Program) -> bytes:
+    # Relocatable ELF64 object for a codegen Program
+    from .elf import build_object
+    encoder = X86Encoder(program)
+    text = encoder.encode()
+    return build_object(text, encoder.symbols)
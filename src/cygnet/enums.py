@@ -1,8 +1,15 @@
 from enum import IntEnum, Enum
 from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
 
 SUCCESS = 0
 FAIL = 1
+# --run and --interpret exit with main's return value, which can be FAIL
+# too, so a source they could not compile exits with this instead
+COMPILE_FAILED_STATUS = 125
+
+DEFAULT_CACHE_SIZE = 256 * 1024 * 1024
 
 class CompilerReturnCode(IntEnum):
     COMPILE_SUCCESS = 0
@@ -19,7 +26,10 @@ class CompileStage(Enum):
     TACKY = 3
     CODEGEN = 4
     ASSEMBLE = 5
-    LINK = 6
+    OBJECT = 6
+    LINK = 7
+    RUN = 8
+    INTERPRET = 9
 
 @dataclass
 class PrintFlags:
@@ -29,3 +39,17 @@ class PrintFlags:
     tacky: bool = False
     ir: bool = False
     asm: bool = False
+
+
+@dataclass
+class CompileOptions:
+    builtin_preprocessor: bool = True
+    use_cache: bool = True
+    cache_dir: Optional[Path] = None
+    cache_max_size: int = DEFAULT_CACHE_SIZE
+    save_temps: bool = False
+    output: Optional[Path] = None
+    time_report: Optional[str] = None
+    verbose: bool = False
+    opt_level: int = 0
+    integrated_as: bool = False
@@ -6,12 +6,26 @@ from cygnet.tokens import TokenType, Token
 class CompilerError(Exception):
     pass
 
+class PreprocessorUnsupported(Exception):
+    # Raised by the built-in preprocessor for input outside its subset,
+    # the driver then falls back to gcc -E
+    def __init__(self, reason):
+        self.reason = reason
+        super().__init__(f"Built-in preprocessor cannot handle {reason}")
+
+
+class PreprocessorError(CompilerError):
+    def __init__(self, message):
+        self.message = message
+        super().__init__(f"Preprocessing failed : {message}")
+
+
 class LexerError(CompilerError):
-    def __init__(self, char, line_num, pos):
+    def __init__(self, char, line_num, column):
         self.char = char
         self.line_num = line_num
-        self.pos = pos
-        super().__init__(f"Lexer error: unexpected character '{char}' at line {line_num} position {pos}")
+        self.column = column
+        super().__init__(f"Lexer error: unexpected character '{char}' at line {line_num} column {column}")
 
 
 class ParserError(CompilerError):
@@ -34,3 +48,15 @@ class TackyGenError(CompilerError):
         self.message = message
         self.node = node
         super().__init__(f"Tacky generator error: {message}, '{node}")
+
+
+class LinkError(CompilerError):
+    def __init__(self, message):
+        self.message = message
+        super().__init__(f"Linking failed:\n{message}")
+
+
+class JitError(CompilerError):
+    def __init__(self, message):
+        self.message = message
+        super().__init__(f"JIT error: {message}")
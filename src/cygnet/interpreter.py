@@ -0,0 +1,71 @@
+from .tackygen import Program, Return, Unary, Constant, Var
+from .tokens import constant_value
+from .optimizer import UNARY_FOLDS, wrap_int
+from .errors import TackyGenError
+
+# Direct execution of TACKY, for getting a program's result without an
+# assembler or linker and as a reference for checking the backend. Values
+# are Python ints kept in signed 32-bit range after every operation, the
+# same semantics ConstantFolder uses.
+
+
+class TackyInterpreter:
+    def __init__(self, program: Program):
+        self.program = program
+        self.variables = {}
+        self.instruction_handlers = {
+            Unary: self.execute_unary,
+        }
+        self.value_readers = {
+            Constant: self.read_constant,
+            Var: self.read_var,
+        }
+        self.constants = {}
+
+    def run(self) -> int:
+        # Executes main and returns its int result
+        return self.run_function(self.program.function)
+
+    def run_function(self, function) -> int:
+        self.variables = {}
+        handlers = self.instruction_handlers
+        for instruction in function.body:
+            if type(instruction) is Return:
+                return self.read(instruction.val)
+            handler = handlers.get(type(instruction))
+            if handler is None:
+                raise TackyGenError("Cannot interpret instruction", instruction)
+            handler(instruction)
+        raise TackyGenError("Function ended without a return", function.identifier)
+
+    def execute_unary(self, instruction):
+        operation = UNARY_FOLDS.get(type(instruction.unary_op))
+        if operation is None:
+            raise TackyGenError("Cannot interpret unary operator", instruction.unary_op)
+        self.variables[instruction.dst.identifier] = wrap_int(operation(self.read(instruction.src)))
+
+    def read(self, val) -> int:
+        reader = self.value_readers.get(type(val))
+        if reader is None:
+            raise TackyGenError("Cannot interpret value", val)
+        return reader(val)
+
+    def read_constant(self, val) -> int:
+        # Parsed once per distinct constant text
+        value = self.constants.get(val.value)
+        if value is None:
+            try:
+                value = self.constants[val.value] = wrap_int(constant_value(str(val.value)))
+            except ValueError:
+                raise TackyGenError("Invalid constant", val)
+        return value
+
+    def read_var(self, val) -> int:
+        try:
+            return self.variables[val.identifier]
+        except KeyError:
+            raise TackyGenError("Read of unassigned variable", val)
+
+
+def interpret(program: Program) -> int:
+    return TackyInterpreter(program).run()
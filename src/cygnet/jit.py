@@ -0,0 +1,85 @@
+import ctypes
+import ctypes.util
+import mmap
+import platform
+from .codegen import Program
+from .encoder import X86Encoder
+from .errors import JitError
+
+# In-process execution of generated code. The function is encoded with
+# X86Encoder, copied into an anonymous mapping that is writable but not
+# executable, flipped to read+execute with mprotect and called through
+# ctypes. Generated code is position independent and only touches its own
+# stack frame, so it runs on the calling thread's stack like any C call.
+
+_libc = None
+
+
+def _load_libc():
+    global _libc
+    if _libc is None:
+        if platform.machine().lower() not in ("x86_64", "amd64") or not hasattr(mmap, "PROT_EXEC"):
+            raise JitError(f"needs x86-64 with POSIX mmap, this is {platform.system()} {platform.machine()}")
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        libc.mmap.restype = ctypes.c_void_p
+        libc.mmap.argtypes = (ctypes.c_void_p, ctypes.c_size_t, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_long)
+        libc.mprotect.argtypes = (ctypes.c_void_p, ctypes.c_size_t, ctypes.c_int)
+        libc.munmap.argtypes = (ctypes.c_void_p, ctypes.c_size_t)
+        _libc = libc
+    return _libc
+
+
+class JitFunction:
+    # Machine code mapped executable, callable as int f(void). Call close()
+    # (or use it as a context manager) to unmap it
+    def __init__(self, code: bytes, entry: int = 0):
+        libc = _load_libc()
+        self.size = max(len(code), 1)
+        address = libc.mmap(None, self.size, mmap.PROT_READ | mmap.PROT_WRITE,
+                            mmap.MAP_PRIVATE | mmap.MAP_ANONYMOUS, -1, 0)
+        if address is None or address == ctypes.c_void_p(-1).value:
+            raise JitError(f"mmap failed: {_errno_message()}")
+        self.address = address
+        ctypes.memmove(address, code, len(code))
+        if libc.mprotect(address, self.size, mmap.PROT_READ | mmap.PROT_EXEC) != 0:
+            message = _errno_message()
+            self.close()
+            raise JitError(f"mprotect failed: {message}")
+        self.function = ctypes.CFUNCTYPE(ctypes.c_int)(address + entry)
+
+    def __call__(self) -> int:
+        if self.address is None:
+            raise JitError("function has been unmapped")
+        return self.function()
+
+    def close(self):
+        if self.address is not None:
+            _load_libc().munmap(self.address, self.size)
+            self.address = None
+            self.function = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _errno_message() -> str:
+    import os
+    return os.strerror(ctypes.get_errno())
+
+
+def compile_function(program: Program, name: str = "main") -> JitFunction:
+    encoder = X86Encoder(program)
+    code = encoder.encode()
+    if name not in encoder.symbols:
+        raise JitError(f"no function named {name}")
+    offset, _ = encoder.symbols[name]
+    return JitFunction(code, offset)
+
+
+def run_program(program: Program) -> int:
+    # Calls main and returns its int result
+    with compile_function(program) as function:
+        return function()
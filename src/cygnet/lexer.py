@@ -3,129 +3,102 @@ from dataclasses import dataclass
 from typing import Optional, List
 from .print import print_token_list, print_error, print_msg
 from .errors import LexerError
-from .tokens import TokenType, KEYWORDS, PATTERNS, Token
+from .tokens import TokenType, KEYWORDS, PATTERNS, Token, TokenBuffer
 import re
 
 
+# All token patterns compiled into one alternation, one named group per
+# entry in PATTERNS. The group that matched maps straight back to its type.
+TOKEN_REGEX = re.compile("|".join(f"(?P<T{i}>{pattern})" for i, (pattern, _) in enumerate(PATTERNS)))
+GROUP_TYPES = {f"T{i}": token_type for i, (_, token_type) in enumerate(PATTERNS)}
+
+# '#line N' (or gcc's '# N "file"') at the start of a line: the next line
+# is line N. The preprocessor writes these around included text so line
+# numbers in the source still count its own lines.
+LINE_MARKER_REGEX = re.compile(r'#[ \t]*(?:line[ \t]+)?(\d+)[^\n]*\n?')
+
+
 class Lexer():
-    def __init__(self, source_code: List[str]):
+    def __init__(self, source_code: str):
         self.source_code = source_code
         self.tokens = []
-        self.token_type = ""
         self.line_num = 1
-        self.in_comment = False
+        self.line_start = 0
 
     def lex(self):
-        
-        for line in self.source_code:
-            pos = 0
-
-            while pos < len(line):
-
-                matches = []
-
-                if not self.in_comment:
-                    comment_start_match = re.match(r'/\*', line[pos:])
-                    if comment_start_match:
-                        self.in_comment = True
-                        pos += comment_start_match.end()
-                        continue
-
-                if self.in_comment:
-                    comment_end_match = re.match(r'\*/', line[pos:])
-                    if comment_end_match:
-                        self.in_comment = False
-                        pos += comment_end_match.end()
-                        continue
-                    else:
-                        pos += 1
-                        continue
-
-                for pattern, token_type in PATTERNS:
-                    match = re.match(pattern, line[pos:])
-
-                    if match:
-                        matches.append((token_type, match.group(), match.end(), match.span()))
-
-                if matches:
-                    longest_match = max(matches, key=lambda x: x[2])
-                    token_type, value, length, span = longest_match
-                    pos = pos + span[1]
-
-                    if token_type == TokenType.IDENTIFIER:
-                        for keyword, keyword_type in KEYWORDS.items():
-                            if value == keyword:
-                                token_type = keyword_type
-
-                    if token_type:
-                        self.tokens.append(Token(type=token_type, value=value, line_num=self.line_num))
-
-                else:
-                    raise LexerError(line[pos], self.line_num, pos)
-
-            self.line_num += 1
-
-        self.tokens.append(Token(type=TokenType.EOF, value=None, line_num=self.line_num))
-        
+        # Drain the token stream into a list, for callers that need all tokens
+        self.tokens = list(self.tokenize())
         return self.tokens
 
-def lexer(source_code: List[str], print_tokens: bool = False):
+    def tokenize(self):
+        # Generator yielding tokens as they are matched, ending with EOF
+        source = self.source_code
+        for token_type, start, end, line_num, column in self._scan():
+            value = source[start:end] if token_type != TokenType.EOF else None
+            yield Token(type=token_type, value=value, line_num=line_num, column=column, offset=start)
+
+    def lex_buffer(self):
+        # Lex into a compact TokenBuffer instead of a list of Token objects
+        buffer = TokenBuffer(self.source_code)
+        append = buffer.append
+        for token_type, start, end, line_num, column in self._scan():
+            append(token_type, start, end - start, line_num, column)
+        return buffer
+
+    def _scan(self):
+        # Core matcher, yields (type, start, end, line, column) per token.
+        # Line tracking starts over on every scan, so lexing twice is the same
 
-    tokens = []
-    token_type = ""
-    line_num = 1
-    in_comment = False
-    
-    for line in source_code:
+        self.line_num = 1
+        self.line_start = 0
+        source = self.source_code
+        end = len(source)
         pos = 0
-
-        while pos < len(line):
-
-            matches = []
-
-            if not in_comment:
-                comment_start_match = re.match(r'/\*', line[pos:])
-                if comment_start_match:
-                    in_comment = True
-                    pos += comment_start_match.end()
+        match_token = TOKEN_REGEX.match
+
+        while pos < end:
+
+            if source.startswith("/*", pos):
+                comment_end = source.find("*/", pos + 2)
+                skip_to = end if comment_end < 0 else comment_end + 2
+                self._advance_lines(pos, skip_to)
+                pos = skip_to
+                continue
+
+            match = match_token(source, pos)
+            if match is None:
+                marker = LINE_MARKER_REGEX.match(source, pos) if pos == self.line_start else None
+                if marker is not None:
+                    pos = marker.end()
+                    self.line_num = int(marker.group(1))
+                    self.line_start = pos
                     continue
+                raise LexerError(source[pos], self.line_num, pos - self.line_start + 1)
 
-            if in_comment:
-                comment_end_match = re.match(r'\*/', line[pos:])
-                if comment_end_match:
-                    in_comment = False
-                    pos += comment_end_match.end()
-                    continue
-                else:
-                    pos += 1
-                    continue
-            
-            for pattern, token_type in PATTERNS:
-                match = re.match(pattern, line[pos:])
+            token_type = GROUP_TYPES[match.lastgroup]
+            start = pos
+            pos = match.end()
+
+            if token_type:
+                if token_type == TokenType.IDENTIFIER:
+                    token_type = KEYWORDS.get(match.group(), token_type)
+                yield (token_type, start, pos, self.line_num, start - self.line_start + 1)
+            else:
+                self._advance_lines(start, pos)
 
-                if match:
-                    matches.append((token_type, match.group(), match.end(), match.span()))
+        yield (TokenType.EOF, end, end, self.line_num, end - self.line_start + 1)
 
-            if matches:
-                longest_match = max(matches, key=lambda x: x[2])
-                token_type, value, length, span = longest_match
-                pos = pos + span[1]
+    def _advance_lines(self, start, end):
+        # Keep line number and line start offset current across skipped text
+        newlines = self.source_code.count("\n", start, end)
+        if newlines:
+            self.line_num += newlines
+            self.line_start = self.source_code.rfind("\n", start, end) + 1
 
-                if token_type == TokenType.IDENTIFIER:
-                    for keyword, keyword_type in KEYWORDS.items():
-                        if value == keyword:
-                            token_type = keyword_type
-                        
-                if token_type:
-                    tokens.append(Token(type=token_type, value=value, line_num=line_num))
+def lexer(source_code: str, print_tokens: bool = False):
 
-            else:
-                raise LexerError(line[pos], line_num, pos)
-                    
-        line_num += 1
+    tokens = Lexer(source_code).lex()
 
-    tokens.append(Token(type=TokenType.EOF, value=None, line_num=line_num))
-        
     if print_tokens:
         print_token_list(tokens)
 
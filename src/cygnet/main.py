@@ -1,15 +1,18 @@
 import typer
-from typing import Optional
+from typing import Optional, List
 from pathlib import Path
-from .enums import CompileStage, PrintFlags
-from .driver import compile_driver
+from .enums import CompileStage, PrintFlags, CompileOptions
+from .driver import compile_batch
 
 app = typer.Typer(help="Cygnet: a simple C compiler in Python")
 
 @app.callback(invoke_without_command=True)
 def build(
-        path: Optional[Path] = typer.Argument(None, help="C source file to compile"),
+        paths: Optional[List[Path]] = typer.Argument(None, help="C source files to compile (or directories with --watch)"),
         assemble: bool = typer.Option(False, "-S", help="Generate assembly only"),
+        compile_only: bool = typer.Option(False, "-c", help="Compile to an object file, do not link"),
+        run: bool = typer.Option(False, "--run", help="Compile and run main in memory, exit with its return value (125 if it does not compile)"),
+        interpret: bool = typer.Option(False, "--interpret", help="Interpret the TACKY IR of main, exit with its return value (125 if it does not compile)"),
         lex: bool = typer.Option(False, "--lex", help="Run lexer only"),
         parse: bool = typer.Option(False, "--parse", help="Run lexer and parser only"),
         tacky: bool = typer.Option(False, "--tacky", help="Stop after TACKY generation"),
@@ -20,13 +23,29 @@ def build(
         print_tacky: bool = typer.Option(False, "--print-tacky", "-k", help="Print TACKY"),
         print_ir: bool = typer.Option(False, "--print-ir", "-r", help="Print IR"),
         print_asm: bool = typer.Option(False, "--print-asm", "-m", help="Print assembly"),
+        opt_level: int = typer.Option(0, "-O", "--opt-level", min=0, help="Optimization level, -O1 folds constant expressions"),
+        integrated_as: bool = typer.Option(False, "--integrated-as", help="Encode machine code and write object files without the external assembler"),
+        external_cpp: bool = typer.Option(False, "--external-cpp", help="Always preprocess with gcc -E instead of the built-in preprocessor"),
+        jobs: Optional[int] = typer.Option(None, "-j", "--jobs", help="Compile up to N files in parallel (default: number of cores)"),
+        output: Optional[Path] = typer.Option(None, "-o", "--output", help="Link all sources into this executable"),
+        cache_dir: Optional[Path] = typer.Option(None, "--cache-dir", help="Directory for the compilation cache (default: ~/.cache/cygnet)"),
+        no_cache: bool = typer.Option(False, "--no-cache", help="Do not read or write the compilation cache"),
+        save_temps: bool = typer.Option(False, "--save-temps", help="Keep the preprocessed .i and assembly .s files"),
+        time_report: bool = typer.Option(False, "--time-report", help="Print per-stage timings and counters"),
+        time_report_json: bool = typer.Option(False, "--time-report-json", help="Print per-stage timings and counters as JSON lines"),
+        verbose: bool = typer.Option(False, "--verbose", "-v", help="Print progress messages"),
+        watch: bool = typer.Option(False, "--watch", help="Keep running and recompile sources whenever they or their headers change"),
         ):
-    if path is None:
+    if not paths:
         typer.echo("Error: no source file provided")
         raise typer.Exit(1)    
 
     # Map compile stage flags to enum
-    if lex:
+    if run:
+        stage = CompileStage.RUN
+    elif interpret:
+        stage = CompileStage.INTERPRET
+    elif lex:
         stage = CompileStage.LEX
     elif parse:
         stage = CompileStage.PARSE
@@ -36,6 +55,8 @@ def build(
         stage = CompileStage.CODEGEN
     elif assemble:
         stage = CompileStage.ASSEMBLE
+    elif compile_only:
+        stage = CompileStage.OBJECT
     else:
         stage = CompileStage.LINK
 
@@ -49,8 +70,26 @@ def build(
         asm = print_asm
     )
         
-    result = compile_driver(path, stage, print_flags)
+    options = CompileOptions(
+        builtin_preprocessor = not external_cpp,
+        use_cache = not no_cache,
+        cache_dir = cache_dir,
+        save_temps = save_temps,
+        time_report = "json" if time_report_json else "table" if time_report else None,
+        verbose = verbose,
+        opt_level = opt_level,
+        integrated_as = integrated_as
+    )
+
+    if watch:
+        from .watch import watch_sources
+        raise typer.Exit(watch_sources(paths, stage, print_flags, options, output))
+
+    result = compile_batch(paths, stage, print_flags, options, jobs, output)
 
+    if stage in (CompileStage.RUN, CompileStage.INTERPRET):
+        # The program's own exit status, or COMPILE_FAILED_STATUS
+        raise typer.Exit(result)
     if result == 0:
         raise typer.Exit(0)
     else:
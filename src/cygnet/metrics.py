@@ -0,0 +1,58 @@
+import json
+import time
+from contextlib import contextmanager
+from dataclasses import fields, is_dataclass
+from typing import Dict
+
+
+class PipelineMetrics:
+    # Wall time per compiler stage plus size counters (tokens, AST nodes,
+    # instructions, frame size, bytes emitted) for one compile. Counters
+    # that need extra work, like walking the AST, are only gathered when
+    # enabled.
+    def __init__(self, path: str = "", enabled: bool = True):
+        self.path = path
+        self.enabled = enabled
+        self.timings: Dict[str, int] = {}
+        self.counters: Dict[str, int] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0) + time.perf_counter_ns() - start
+
+    def count(self, name: str, value: int):
+        self.counters[name] = value
+
+    def total_ns(self) -> int:
+        return sum(self.timings.values())
+
+    def to_dict(self):
+        return {
+            "file": self.path,
+            "stages_ms": {name: ns / 1e6 for name, ns in self.timings.items()},
+            "total_ms": self.total_ns() / 1e6,
+            "counters": dict(self.counters),
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
+
+
+def count_nodes(root) -> int:
+    # Number of dataclass nodes reachable from root (AST or IR), walked
+    # with an explicit stack so deep expression trees are fine
+    count = 0
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif is_dataclass(node):
+            count += 1
+            for field in fields(node):
+                stack.append(getattr(node, field.name))
+    return count
@@ -0,0 +1,84 @@
+from .tackygen import Program, Function, Return, Unary, Constant, Var, Complement, Negate
+from .tokens import constant_value
+from .errors import TackyGenError
+
+# TACKY optimization passes, run between TackyGenerator and TackyToAssembly
+# when compiling with -O1 or above.
+
+INT_BITS = 32
+
+
+def wrap_int(value: int) -> int:
+    # Reduce to a signed two's-complement int, so -(-2147483648) stays
+    # -2147483648 just as negl computes it
+    value &= (1 << INT_BITS) - 1
+    if value >= 1 << (INT_BITS - 1):
+        value -= 1 << INT_BITS
+    return value
+
+
+# Unary operator type -> evaluation on a Python int, wrapped to int
+UNARY_FOLDS = {
+    Complement: lambda value: ~value,
+    Negate: lambda value: -value,
+}
+
+
+class ConstantFolder:
+    # Evaluates unary operations whose source is a known constant and drops
+    # them, substituting the result wherever the temporary is read. A chain
+    # like ~(-(~5)) collapses to a single Return(Constant).
+    def __init__(self, program: Program):
+        self.program = program
+        self.folded = 0
+
+    def fold(self) -> Program:
+        function = self.program.function
+        return Program(Function(function.identifier, self.fold_body(function.body)))
+
+    def fold_body(self, body):
+        # Var identifier -> constant value it is known to hold
+        known = {}
+        instructions = []
+        for instruction in body:
+            match instruction:
+                case Unary():
+                    src = self._resolve(instruction.src, known)
+                    evaluate = UNARY_FOLDS.get(type(instruction.unary_op))
+                    value = self._constant(src) if evaluate is not None and isinstance(instruction.dst, Var) else None
+                    if value is not None:
+                        known[instruction.dst.identifier] = Constant(str(wrap_int(evaluate(value))))
+                        self.folded += 1
+                    else:
+                        instructions.append(Unary(instruction.unary_op, src, instruction.dst))
+                case Return():
+                    instructions.append(Return(self._resolve(instruction.val, known)))
+                case _:
+                    raise TackyGenError("Unexpected instruction in constant folding", instruction)
+        return instructions
+
+    def _constant(self, val):
+        # Integer value of a constant operand, None if it isn't one. Malformed
+        # text such as 09 is left for the assembler to reject
+        if not isinstance(val, Constant):
+            return None
+        try:
+            return constant_value(val.value)
+        except ValueError:
+            return None
+
+    def _resolve(self, val, known):
+        if isinstance(val, Var):
+            return known.get(val.identifier, val)
+        return val
+
+
+def optimize(program: Program, opt_level: int, metrics=None) -> Program:
+    # Runs the TACKY passes enabled at opt_level
+    if opt_level < 1:
+        return program
+    folder = ConstantFolder(program)
+    program = folder.fold()
+    if metrics is not None:
+        metrics.count("folded_instructions", folder.folded)
+    return program
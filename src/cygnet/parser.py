@@ -1,6 +1,6 @@
 from dataclasses import dataclass
-from .tokens import TokenType, Token
-from typing import List
+from .tokens import TokenType, Token, TokenStream
+from typing import Iterable
 from .errors import ParserError
 
 # AST Nodes, abstract base classes
@@ -87,27 +87,47 @@ class Negate(UnaryOperator):
         return f"Negate at {self.line}"
     
 
+# Expression operator tables. Prefix operators map a token to the
+# UnaryOperator node it builds, binary operators map a token to
+# (precedence, factory) where factory(line, left, right) builds the node.
+# Higher precedence binds tighter, all binary operators are left associative
+
+PREFIX_OPERATORS = {
+    TokenType.COMPLEMENT: Complement,
+    TokenType.NEGATE: Negate,
+}
+
+BINARY_OPERATORS = {}
+
+# Prefix operators bind tighter than any binary operator
+UNARY_PRECEDENCE = 100
+
+# Operator stack marker for an open parenthesis
+GROUP = None
+
+
 # Main parsing class
     
 class Parser:
-    def __init__(self, tokens: List[Token]):
-        self.tokens = tokens
+    def __init__(self, tokens: Iterable[Token]):
+        # Accepts a token list or a lazy token generator such as Lexer.tokenize()
+        self.tokens = TokenStream(tokens)
         self.current = 0
 
     # Helper functions
 
     def get_line(self):
-        if self.current >= len(self.tokens):
-            raise ParserError(f"Beyond end of tokens list, position {self.current}, tokens length {len(self.tokens)}")
-        return self.tokens[self.current].line_num
+        return self.peek().line_num
     
     def peek(self):
-        if self.current >= len(self.tokens):
-            raise ParserError(f"Beyond end of tokens list, position {self.current}, tokens length {len(self.tokens)}")
-        return self.tokens[self.current]
+        token = self.tokens.peek()
+        if token is None:
+            raise ParserError(f"Beyond end of tokens list, position {self.current}")
+        return token
     
     def consume(self):
         token = self.peek()
+        self.tokens.advance()
         self.current += 1
         return token
         
@@ -122,33 +142,58 @@ class Parser:
     
     # Parsing functions
 
-    def parse_unop(self):
-        token = self.consume()
-        if token.type == TokenType.COMPLEMENT:
-            return Complement(self.get_line())
-        elif token.type == TokenType.NEGATE:
-            return Negate(self.get_line())
+    def reduce(self, operators, operands):
+        # Pops one operator and builds its node from the operand stack. The
+        # node's line is the line of the token following its last operand
+        _, operator = operators.pop()
+        operand = operands.pop()
+        if isinstance(operator, UnaryOperator):
+            operands.append(Unary(self.get_line(), operator, operand))
         else:
-            raise ParserError(f"Unexpected unary operator type", token.line_num, token)
-    
+            operands.append(operator(self.get_line(), operands.pop(), operand))
+
     def parse_exp(self):
-        next_token = self.peek()
-        if next_token.type == TokenType.CONSTANT:
+        # Iterative precedence climbing: prefix operators and open parens are
+        # pushed on an operator stack and reduced once the operand after them
+        # is complete, so nesting depth is bounded by memory, not recursion
+        operators = []
+        operands = []
+        while True:
+            # Prefix position, expecting an operand
+            token = self.peek()
+            prefix = PREFIX_OPERATORS.get(token.type)
+            if prefix is not None:
+                self.consume()
+                operators.append((UNARY_PRECEDENCE, prefix(self.get_line())))
+                continue
+            if token.type == TokenType.PAREN_OPEN:
+                self.consume()
+                operators.append(GROUP)
+                continue
+            if token.type != TokenType.CONSTANT:
+                raise ParserError(f"Unexpected token", token.line_num, token)
             self.consume()
-            return Constant(self.get_line(), next_token.value)
-        elif next_token.type == TokenType.COMPLEMENT or next_token.type == TokenType.NEGATE:
-            operator = self.parse_unop()
-            inner_exp = self.parse_exp()
-            return Unary(self.get_line(), operator, inner_exp)
-        elif next_token.type == TokenType.PAREN_OPEN:
-            self.consume()
-            inner_exp = self.parse_exp()
-            self.expect(TokenType.PAREN_CLOSE)
-            return inner_exp
-        else:
-            raise ParserError(f"Unexpected token", next_token.line_num, next_token)
+            operands.append(Constant(self.get_line(), token.value))
+
+            # Infix position, after a complete operand
+            while True:
+                token = self.peek()
+                binary = BINARY_OPERATORS.get(token.type)
+                if binary is not None:
+                    precedence, factory = binary
+                    # Left associative: reduce anything binding at least as tightly
+                    while operators and operators[-1] is not GROUP and operators[-1][0] >= precedence:
+                        self.reduce(operators, operands)
+                    self.consume()
+                    operators.append((precedence, factory))
+                    break
+                while operators and operators[-1] is not GROUP:
+                    self.reduce(operators, operands)
+                if not operators:
+                    return operands.pop()
+                self.expect(TokenType.PAREN_CLOSE)
+                operators.pop()
 
-        
     def parse_statement(self):
         self.expect(TokenType.RETURN)
         expr = self.parse_exp()
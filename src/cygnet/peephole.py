@@ -0,0 +1,179 @@
+from typing import Dict, Iterable, Optional
+from .codegen import Program, Function, Mov, Unary, Ret, AllocateStack, Stack, Register, Reg
+from .regalloc import instruction_operands
+from .errors import TackyAssemblyError
+
+# Peephole optimization over the final assembly instructions, run after
+# FixingUpInstructions at -O1.
+#
+# The instruction list is walked from the end with a small window, so that
+# liveness after the window is always known: a location is live if a later
+# instruction reads it before overwriting it, and after Ret only AX is.
+# Each rule looks at a window plus that live set and returns replacement
+# instructions, or None if it does not apply. Replacements are walked again,
+# so rules chain, e.g. sink_copy moves a copy up until forward_store can
+# merge it into the store that feeds it.
+
+
+def location(operand):
+    # Hashable key for a Register or Stack operand, None for immediates
+    if isinstance(operand, Register):
+        return ("reg", operand.reg)
+    elif isinstance(operand, Stack):
+        return ("stack", operand.offset)
+    return None
+
+
+def is_memory(operand):
+    return isinstance(operand, Stack)
+
+
+def valid_mov(src, dst):
+    # movl can't take two memory operands
+    return not (is_memory(src) and is_memory(dst))
+
+
+# Rules: window -> replacement list or None
+
+def self_move(window, live_after):
+    # movl %ecx, %ecx
+    mov, = window
+    if isinstance(mov, Mov) and mov.op_src == mov.op_dst:
+        return []
+    return None
+
+
+def dead_store(window, live_after):
+    # A store to a location that is overwritten or never read again
+    mov, = window
+    if isinstance(mov, Mov) and location(mov.op_dst) not in live_after:
+        return []
+    return None
+
+
+def dead_unary(window, live_after):
+    # An operation whose result is never read
+    unary, = window
+    if isinstance(unary, Unary) and location(unary.operand) not in live_after:
+        return []
+    return None
+
+
+def forward_store(window, live_after):
+    # movl a, x / movl x, b -> movl a, b when x is dead afterwards. Covers a
+    # value stored to the stack and reloaded into AX before ret, and round
+    # trips through R10 once one side is a register
+    first, second = window
+    if not (isinstance(first, Mov) and isinstance(second, Mov)):
+        return None
+    temp = location(first.op_dst)
+    if location(second.op_src) != temp or temp in live_after:
+        return None
+    if location(first.op_src) == temp or not valid_mov(first.op_src, second.op_dst):
+        return None
+    return [Mov(first.op_src, second.op_dst)]
+
+
+def sink_copy(window, live_after):
+    # op x / movl x, b -> movl x, b / op b when x is dead afterwards, so the
+    # operation happens in its final location and the copy moves up towards
+    # the store that feeds x
+    unary, mov = window
+    if not (isinstance(unary, Unary) and isinstance(mov, Mov)):
+        return None
+    temp = location(unary.operand)
+    if location(mov.op_src) != temp or temp in live_after or location(mov.op_dst) == temp:
+        return None
+    if not valid_mov(mov.op_src, mov.op_dst):
+        return None
+    return [mov, Unary(unary.unary_op, mov.op_dst)]
+
+
+# Rule name -> (window size, rule), tried in this order
+PEEPHOLE_RULES = {
+    "self_move": (1, self_move),
+    "dead_store": (1, dead_store),
+    "dead_unary": (1, dead_unary),
+    "forward_store": (2, forward_store),
+    "sink_copy": (2, sink_copy),
+}
+
+RETURN_LIVE = frozenset({("reg", Reg.AX)})
+
+
+def live_before(asm_insn, live_after):
+    if isinstance(asm_insn, Ret):
+        return RETURN_LIVE
+    elif isinstance(asm_insn, Mov):
+        live = set(live_after)
+        live.discard(location(asm_insn.op_dst))
+        src = location(asm_insn.op_src)
+        if src is not None:
+            live.add(src)
+        return live
+    elif isinstance(asm_insn, Unary):
+        return live_after | {location(asm_insn.operand)}
+    return live_after
+
+
+class PeepholeOptimizer:
+    def __init__(self, asm_root: Program, rules: Optional[Iterable[str]] = None):
+        self.asm_root = asm_root
+        names = list(PEEPHOLE_RULES) if rules is None else list(rules)
+        for name in names:
+            if name not in PEEPHOLE_RULES:
+                raise TackyAssemblyError(f"Unknown peephole rule {name}")
+        self.rules = [(name,) + PEEPHOLE_RULES[name] for name in names]
+        # Rule name -> instructions it removed (net, a rewrite that keeps the
+        # count counts zero) and times it fired
+        self.removed: Dict[str, int] = {name: 0 for name in names}
+        self.applied: Dict[str, int] = {name: 0 for name in names}
+
+    def optimize(self):
+        return self.optimize_program(self.asm_root)
+
+    def optimize_program(self, asm_program):
+        function = self.optimize_function(asm_program.function)
+        return Program(function=function)
+
+    def optimize_function(self, asm_function):
+        pending = list(asm_function.instructions)
+        # Already optimized suffix, reversed, with the live set before each entry
+        tail = []
+        lives = []
+        while pending:
+            asm_insn = pending.pop()
+            for name, size, rule in self.rules:
+                if size - 1 > len(tail):
+                    continue
+                window = [asm_insn] + tail[len(tail) - size + 1:][::-1]
+                live_after = lives[-size] if len(tail) >= size else frozenset()
+                replacement = rule(window, live_after)
+                if replacement is None:
+                    continue
+                del tail[len(tail) - size + 1:]
+                del lives[len(lives) - size + 1:]
+                pending.extend(replacement)
+                self.applied[name] += 1
+                self.removed[name] += size - len(replacement)
+                break
+            else:
+                tail.append(asm_insn)
+                lives.append(live_before(asm_insn, lives[-1] if lives else frozenset()))
+        tail.reverse()
+        return Function(asm_function.name, self.shrink_frame(tail), asm_function.stack_offset)
+
+    def shrink_frame(self, instructions):
+        # Slots whose loads and stores were all removed don't need frame space
+        deepest = 0
+        for asm_insn in instructions:
+            if isinstance(asm_insn, AllocateStack):
+                continue
+            for operand in instruction_operands(asm_insn):
+                if isinstance(operand, Stack):
+                    deepest = min(deepest, operand.offset)
+        return [AllocateStack(max(asm_insn.value, deepest)) if isinstance(asm_insn, AllocateStack) else asm_insn
+                for asm_insn in instructions]
+
+    def total_removed(self) -> int:
+        return sum(self.removed.values())
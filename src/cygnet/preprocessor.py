@@ -0,0 +1,373 @@
+import re
+from pathlib import Path
+from typing import Dict, List
+from .errors import PreprocessorUnsupported
+
+# Built-in preprocessor covering the common subset of directives: object-like
+# #define/#undef, #include "local.h", #if/#ifdef/#ifndef/#elif/#else/#endif and
+# #pragma once. Anything else raises PreprocessorUnsupported so the driver can
+# fall back to gcc -E, which keeps gcc's behaviour and error messages.
+
+DIRECTIVE_REGEX = re.compile(r'[ \t]*#[ \t]*(\w*)[ \t]*(.*)')
+DEFINE_REGEX = re.compile(r'([A-Za-z_]\w*)(\(?)(.*)')
+INCLUDE_REGEX = re.compile(r'"([^"]+)"\s*$')
+IDENTIFIER_REGEX = re.compile(r'[A-Za-z_]\w*$')
+
+# Comments and literals in one pass, literals are kept and comments replaced.
+# A bare '/*' only matches when the comment is never closed.
+COMMENT_REGEX = re.compile(r'//[^\n]*|/\*.*?\*/|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|/\*', re.S)
+
+# Literals and pp-numbers are matched first so that macro names are never
+# replaced inside them (e.g. the 'x' in 0x10)
+EXPAND_REGEX = re.compile(r'"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|\.?\d[\w.]*|([A-Za-z_]\w*)')
+
+# Names gcc defines itself, we can't know their values
+PREDEFINED_REGEX = re.compile(r'__\w*__$|linux$|unix$')
+# Substrings every name PREDEFINED_REGEX matches contains, text without any
+# of them can skip macro expansion
+PREDEFINED_HINTS = ("__", "linux", "unix")
+
+DEFINED_REGEX = re.compile(r'\bdefined\s*(?:\(\s*([A-Za-z_]\w*)\s*\)|([A-Za-z_]\w*))')
+EXPR_TOKEN_REGEX = re.compile(r'\s*(?:(0[xX][0-9a-fA-F]+|\d+)([uUlL]*)|(&&|\|\||<<|>>|<=|>=|==|!=|[-+*/%<>&^|!~()?:])|([A-Za-z_]\w*))')
+
+MAX_INCLUDE_DEPTH = 200
+
+# #if arithmetic is done in intmax_t. Unsigned operands are left to gcc, so
+# every value here is signed and wraps at 64 bits as gcc's does
+INTMAX_BITS = 64
+INTMAX_MAX = (1 << (INTMAX_BITS - 1)) - 1
+
+# Binary operators for #if expressions: precedence and evaluation
+BINARY_OPERATORS = {
+    "||": (1, lambda a, b: int(bool(a) or bool(b))),
+    "&&": (2, lambda a, b: int(bool(a) and bool(b))),
+    "|": (3, lambda a, b: a | b),
+    "^": (4, lambda a, b: a ^ b),
+    "&": (5, lambda a, b: a & b),
+    "==": (6, lambda a, b: int(a == b)),
+    "!=": (6, lambda a, b: int(a != b)),
+    "<": (7, lambda a, b: int(a < b)),
+    ">": (7, lambda a, b: int(a > b)),
+    "<=": (7, lambda a, b: int(a <= b)),
+    ">=": (7, lambda a, b: int(a >= b)),
+    "<<": (8, lambda a, b: a << _shift_count(b)),
+    ">>": (8, lambda a, b: a >> _shift_count(b)),
+    "+": (9, lambda a, b: a + b),
+    "-": (9, lambda a, b: a - b),
+    "*": (10, lambda a, b: a * b),
+    "/": (10, lambda a, b: _c_div(a, b)),
+    "%": (10, lambda a, b: a - b * _c_div(a, b)),
+}
+
+UNARY_OPERATORS = {
+    "!": lambda a: int(not a),
+    "~": lambda a: ~a,
+    "-": lambda a: -a,
+    "+": lambda a: a,
+}
+
+
+def _parse_integer(number):
+    # Decimal, hex and octal constants as in C
+    try:
+        if number[:2] in ("0x", "0X"):
+            return int(number, 16)
+        if number.startswith("0"):
+            return int(number, 8)
+        return int(number)
+    except ValueError:
+        raise PreprocessorUnsupported(f"invalid integer {number} in #if")
+
+
+def _wrap(value):
+    # Two's complement intmax_t
+    return ((value + INTMAX_MAX + 1) & ((1 << INTMAX_BITS) - 1)) - INTMAX_MAX - 1
+
+
+def _shift_count(count):
+    # Shifting by the width or more, or by a negative count, is undefined;
+    # gcc has its own answer and diagnostic for it
+    if not 0 <= count < INTMAX_BITS:
+        raise PreprocessorUnsupported(f"shift by {count} in #if")
+    return count
+
+
+def _may_use_predefined(text):
+    return any(hint in text for hint in PREDEFINED_HINTS)
+
+
+def _splice_lines(text):
+    # Joins backslash-newline continuations and adds an empty line after
+    # each joined line per splice, so the lines after it keep their numbers
+    if "\\\n" not in text:
+        return text
+    lines = text.split("\n")
+    output = []
+    pending = []
+    for index, line in enumerate(lines):
+        if line.endswith("\\") and index < len(lines) - 1:
+            pending.append(line[:-1])
+            continue
+        pending.append(line)
+        output.append("".join(pending))
+        output.extend([""] * (len(pending) - 1))
+        pending = []
+    return "\n".join(output)
+
+
+def _c_div(a, b):
+    # C division truncates toward zero
+    if b == 0:
+        raise PreprocessorUnsupported("division by zero in #if")
+    quotient = abs(a) // abs(b)
+    return quotient if (a < 0) == (b < 0) else -quotient
+
+
+class Preprocessor:
+    def __init__(self):
+        self.macros: Dict[str, str] = {}
+        self.dependencies: List[Path] = []
+        self.once_files = set()
+        self.include_depth = 0
+
+    def preprocess_file(self, path: Path) -> str:
+        try:
+            text = path.read_text()
+        except (OSError, UnicodeDecodeError) as e:
+            raise PreprocessorUnsupported(f"cannot read {path}: {e}")
+        self.dependencies.append(path)
+        return self.preprocess(text, path.parent)
+
+    def preprocess(self, text: str, base_dir: Path) -> str:
+        # Fast path: nothing for a preprocessor to do, hand the text straight on
+        # unless it might name a macro gcc predefines
+        if ("#" not in text and "/*" not in text and "\\" not in text and not self.macros
+                and not _may_use_predefined(text)):
+            return text
+
+        text = self._strip_comments(_splice_lines(text))
+
+        output = []
+        # Each frame: (enclosing region active, a branch already taken, this branch active)
+        conditions = []
+        active = True
+
+        for line_num, line in enumerate(text.split("\n"), 1):
+            directive = DIRECTIVE_REGEX.match(line)
+            if directive is None:
+                output.append(self._expand(line) if active else "")
+                continue
+
+            name, argument = directive.group(1), directive.group(2).strip()
+
+            if name in ("if", "ifdef", "ifndef"):
+                if active:
+                    taken = self._evaluate_condition(name, argument)
+                    conditions.append((True, taken, taken))
+                    active = taken
+                else:
+                    conditions.append((False, True, False))
+            elif name in ("elif", "else"):
+                if not conditions:
+                    raise PreprocessorUnsupported(f"#{name} without #if")
+                enclosing, taken, _ = conditions[-1]
+                if enclosing and not taken:
+                    branch = True if name == "else" else bool(self._evaluate(argument))
+                else:
+                    branch = False
+                conditions[-1] = (enclosing, taken or branch, branch)
+                active = branch
+            elif name == "endif":
+                if not conditions:
+                    raise PreprocessorUnsupported("#endif without #if")
+                enclosing, _, _ = conditions.pop()
+                active = enclosing
+            elif not active:
+                # Other directives in skipped groups are ignored
+                pass
+            elif name == "define":
+                self._define(argument)
+            elif name == "undef":
+                self.macros.pop(argument, None)
+            elif name == "include":
+                # The included text is numbered from 1 and this file picks up
+                # again at the next line, the lexer honours the #line markers
+                included = self._include(argument, base_dir)
+                if included:
+                    output.append(f"#line 1\n{included}\n#line {line_num + 1}")
+                    continue
+            elif name == "pragma" and argument == "once":
+                pass
+            elif name == "":
+                # Null directive
+                pass
+            else:
+                raise PreprocessorUnsupported(f"#{name} directive")
+
+            # Keep a blank line in place of the directive so line numbers still match
+            output.append("")
+
+        if conditions:
+            raise PreprocessorUnsupported("unterminated #if")
+
+        return "\n".join(output)
+
+    def _strip_comments(self, text):
+        def replace(match):
+            comment = match.group()
+            if comment == "/*":
+                raise PreprocessorUnsupported("unterminated comment")
+            if comment.startswith("/*"):
+                return " " + "\n" * comment.count("\n")
+            if comment.startswith("//"):
+                return " "
+            return comment
+        return COMMENT_REGEX.sub(replace, text)
+
+    def _define(self, argument):
+        match = DEFINE_REGEX.match(argument)
+        if match is None:
+            raise PreprocessorUnsupported(f"#define {argument}")
+        name, paren, body = match.groups()
+        if paren:
+            raise PreprocessorUnsupported(f"function-like macro {name}")
+        if "#" in body:
+            raise PreprocessorUnsupported(f"# operator in macro {name}")
+        self.macros[name] = body.strip()
+
+    def _include(self, argument, base_dir):
+        match = INCLUDE_REGEX.match(argument)
+        if match is None:
+            raise PreprocessorUnsupported(f"#include {argument}")
+        path = base_dir / match.group(1)
+        if not path.is_file():
+            raise PreprocessorUnsupported(f"include file {match.group(1)} not found locally")
+        resolved = path.resolve()
+        if resolved in self.once_files:
+            return ""
+        if self.include_depth >= MAX_INCLUDE_DEPTH:
+            raise PreprocessorUnsupported("#include nested too deeply")
+
+        try:
+            text = path.read_text()
+        except (OSError, UnicodeDecodeError) as e:
+            raise PreprocessorUnsupported(f"cannot read {path}: {e}")
+        if re.search(r'^[ \t]*#[ \t]*pragma[ \t]+once[ \t]*$', text, re.M):
+            self.once_files.add(resolved)
+        self.dependencies.append(path)
+
+        self.include_depth += 1
+        try:
+            return self.preprocess(text, path.parent)
+        finally:
+            self.include_depth -= 1
+
+    def _expand(self, text, hidden=()):
+        if not self.macros and not _may_use_predefined(text):
+            return text
+
+        def replace(match):
+            name = match.group(1)
+            if name is None:
+                return match.group()
+            if name in self.macros and name not in hidden:
+                return self._expand(self.macros[name], hidden + (name,))
+            if PREDEFINED_REGEX.match(name):
+                raise PreprocessorUnsupported(f"predefined macro {name}")
+            return name
+
+        return EXPAND_REGEX.sub(replace, text)
+
+    # Conditional expressions
+
+    def _evaluate_condition(self, name, argument):
+        if name == "if":
+            return bool(self._evaluate(argument))
+        if IDENTIFIER_REGEX.match(argument) is None:
+            raise PreprocessorUnsupported(f"#{name} {argument}")
+        if argument not in self.macros and PREDEFINED_REGEX.match(argument):
+            raise PreprocessorUnsupported(f"predefined macro {argument}")
+        defined = argument in self.macros
+        return defined if name == "ifdef" else not defined
+
+    def _evaluate(self, expression):
+        def replace_defined(match):
+            name = match.group(1) or match.group(2)
+            if name not in self.macros and PREDEFINED_REGEX.match(name):
+                raise PreprocessorUnsupported(f"predefined macro {name}")
+            return "1" if name in self.macros else "0"
+
+        expression = self._expand(DEFINED_REGEX.sub(replace_defined, expression))
+        tokens = self._tokenize_expression(expression)
+        if not tokens:
+            raise PreprocessorUnsupported("#if with no expression")
+        try:
+            value, pos = self._parse_conditional(tokens, 0)
+        except (ValueError, ZeroDivisionError, OverflowError, MemoryError) as e:
+            # Leave the diagnostic to gcc
+            raise PreprocessorUnsupported(f"#if {expression} ({e})")
+        if pos != len(tokens):
+            raise PreprocessorUnsupported(f"#if {expression}")
+        return value
+
+    def _tokenize_expression(self, expression):
+        tokens = []
+        pos = 0
+        expression = expression.rstrip()
+        while pos < len(expression):
+            match = EXPR_TOKEN_REGEX.match(expression, pos)
+            if match is None:
+                raise PreprocessorUnsupported(f"#if {expression}")
+            number, suffix, operator, identifier = match.groups()
+            if number is not None:
+                value = _parse_integer(number)
+                # An unsigned operand makes the whole operation unsigned, and a
+                # constant too big for intmax_t is unsigned even without a suffix
+                if "u" in suffix.lower() or value > INTMAX_MAX:
+                    raise PreprocessorUnsupported(f"unsigned constant {number}{suffix} in #if")
+                tokens.append(value)
+            elif operator is not None:
+                tokens.append(operator)
+            else:
+                # Identifiers left after macro expansion evaluate to 0
+                tokens.append(0)
+            pos = match.end()
+        return tokens
+
+    def _parse_conditional(self, tokens, pos):
+        condition, pos = self._parse_binary(tokens, pos, 1)
+        if pos < len(tokens) and tokens[pos] == "?":
+            when_true, pos = self._parse_conditional(tokens, pos + 1)
+            if pos >= len(tokens) or tokens[pos] != ":":
+                raise PreprocessorUnsupported("malformed ?: in #if")
+            when_false, pos = self._parse_conditional(tokens, pos + 1)
+            return (when_true if condition else when_false), pos
+        return condition, pos
+
+    def _parse_binary(self, tokens, pos, min_precedence):
+        left, pos = self._parse_unary(tokens, pos)
+        while pos < len(tokens):
+            operator = tokens[pos]
+            entry = BINARY_OPERATORS.get(operator) if isinstance(operator, str) else None
+            if entry is None or entry[0] < min_precedence:
+                break
+            precedence, apply = entry
+            right, pos = self._parse_binary(tokens, pos + 1, precedence + 1)
+            left = _wrap(apply(left, right))
+        return left, pos
+
+    def _parse_unary(self, tokens, pos):
+        if pos >= len(tokens):
+            raise PreprocessorUnsupported("truncated #if expression")
+        token = tokens[pos]
+        if isinstance(token, int):
+            return token, pos + 1
+        if token in UNARY_OPERATORS:
+            value, pos = self._parse_unary(tokens, pos + 1)
+            return _wrap(UNARY_OPERATORS[token](value)), pos
+        if token == "(":
+            value, pos = self._parse_conditional(tokens, pos + 1)
+            if pos >= len(tokens) or tokens[pos] != ")":
+                raise PreprocessorUnsupported("unbalanced parentheses in #if")
+            return value, pos + 1
+        raise PreprocessorUnsupported(f"unexpected '{token}' in #if")
@@ -1,10 +1,29 @@
-from rich import print
+import builtins
+
+# Leveled logging for progress messages. Quiet by default: a disabled
+# message costs one comparison and its arguments are never formatted.
+LOG_LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+log_level = LOG_LEVELS["WARNING"]
+
+def set_log_level(name):
+    global log_level
+    log_level = LOG_LEVELS[name]
+
+def log_msg(type, message, *args):
+    if LOG_LEVELS[type] >= log_level:
+        print_msg(type, message % args if args else message)
+
+def print(*objects, **kwargs):
+    # rich is only imported the first time something is actually printed
+    from rich import print as rich_print
+    rich_print(*objects, **kwargs)
 
 def print_source_code(source):
     print("---SOURCE---")
-    max_num_width = len(str(len(source)))
+    lines = source.splitlines()
+    max_num_width = len(str(len(lines)))
     line_num = 1
-    for line in source:
+    for line in lines:
         print(f"{line_num:>{max_num_width}}: {line}")
         line_num += 1
 
@@ -19,6 +38,28 @@ def print_token_list(tokens):
 
         prev_line_num = token.line_num
 
+def print_batch_summary(results):
+    print("---SUMMARY---")
+    for path, result in results:
+        status = "[green]OK[/green]    " if result == 0 else "[red]FAILED[/red]"
+        print(f"{status} {path}")
+    failed = sum(1 for _, result in results if result != 0)
+    print(f"{len(results) - failed} succeeded, {failed} failed")
+
+def print_time_report(metrics, format="table"):
+    if format == "json":
+        # Plain stdout, one JSON object per compiled file
+        builtins.print(metrics.to_json())
+        return
+    print(f"---TIME REPORT: {metrics.path}---")
+    total = metrics.total_ns() or 1
+    for name, ns in metrics.timings.items():
+        print(f"{name:<16}{ns / 1e6:>10.3f} ms {100 * ns / total:>6.1f}%")
+    print(f"{'total':<16}{metrics.total_ns() / 1e6:>10.3f} ms")
+    width = max([20] + [len(name) + 2 for name in metrics.counters])
+    for name, value in metrics.counters.items():
+        print(f"{name:<{width}}{value:>10}")
+
 def print_msg(type, message):
     print(f"[green][{type}][/green]: {message}")
 
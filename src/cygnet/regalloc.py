@@ -0,0 +1,209 @@
+import heapq
+from typing import Dict, List
+from .codegen import Program, Function, Mov, Unary, Ret, Pseudo, Stack, Imm, Register, Reg
+from .errors import TackyAssemblyError
+
+# Registers handed out to pseudos. AX carries the return value and R10 is
+# the scratch register FixingUpInstructions uses for memory-to-memory moves,
+# so both stay out of the pool. All of these are caller-saved, nothing has
+# to be preserved in the prologue.
+ALLOCATABLE_REGISTERS = (Reg.CX, Reg.DX, Reg.SI, Reg.DI, Reg.R8, Reg.R9, Reg.R11)
+
+
+class LiveInterval:
+    def __init__(self, identifier: str, start: int):
+        self.identifier = identifier
+        self.start = start
+        self.end = start
+
+
+def instruction_operands(asm_insn):
+    if isinstance(asm_insn, Mov):
+        return (asm_insn.op_src, asm_insn.op_dst)
+    elif isinstance(asm_insn, Unary):
+        return (asm_insn.operand,)
+    elif isinstance(asm_insn, Ret):
+        return ()
+    else:
+        raise TackyAssemblyError("Error computing liveness for instruction", asm_insn)
+
+
+def live_intervals(instructions, operand_type, key) -> List[LiveInterval]:
+    # Live interval of every operand of operand_type, identified by its key
+    # attribute. Function bodies are straight-line code, so a value is live
+    # from the instruction that first mentions it to the one that last reads it
+    intervals = {}
+    for index, asm_insn in enumerate(instructions):
+        for asm_op in instruction_operands(asm_insn):
+            if isinstance(asm_op, operand_type):
+                identifier = getattr(asm_op, key)
+                interval = intervals.get(identifier)
+                if interval is None:
+                    intervals[identifier] = LiveInterval(identifier, index)
+                else:
+                    interval.end = index
+    # Dicts keep insertion order, which is already by start
+    return list(intervals.values())
+
+
+class RegisterAllocator:
+    # Linear-scan register allocation, the -O1 replacement for PseudoReplacer.
+    # Pseudo live intervals are walked in start order and given a free
+    # register; when the pool is empty the interval ending last is spilled to
+    # a 4-byte stack slot, exactly like PseudoReplacer would have placed it.
+    def __init__(self, asm_root: Program, registers=ALLOCATABLE_REGISTERS):
+        self.asm_root = asm_root
+        self.registers = registers
+        self.assignment: Dict[str, object] = {}
+        self.stack_offset = 0
+        self.spilled = 0
+
+    def replace(self):
+        return self.replace_program(self.asm_root)
+
+    def replace_program(self, asm_program):
+        function = self.replace_function(asm_program.function)
+        return Program(function=function)
+
+    def replace_function(self, asm_function):
+        self.allocate(live_intervals(asm_function.instructions, Pseudo, "identifier"))
+        cnv_asm_insns = []
+        for asm_insn in asm_function.instructions:
+            cnv_asm_insn = self.replace_instruction(asm_insn)
+            # Moves between two pseudos that ended up in the same register vanish
+            if isinstance(cnv_asm_insn, Mov) and cnv_asm_insn.op_src == cnv_asm_insn.op_dst:
+                continue
+            cnv_asm_insns.append(cnv_asm_insn)
+        return Function(asm_function.name, cnv_asm_insns, self.stack_offset)
+
+    # Linear scan
+
+    def allocate(self, intervals):
+        free = list(reversed(self.registers))
+        active = []
+        for interval in intervals:
+            # An interval ending where this one starts is only read there, and
+            # every instruction reads its sources before writing, so its
+            # register can be reused straight away
+            still_active = []
+            for other in active:
+                if other.end <= interval.start:
+                    free.append(self.assignment[other.identifier].reg)
+                else:
+                    still_active.append(other)
+            active = still_active
+
+            if free:
+                self.assignment[interval.identifier] = Register(free.pop())
+                active.append(interval)
+                continue
+
+            # Out of registers: spill whichever interval ends last
+            victim = max(active, key=lambda other: other.end, default=None)
+            if victim is not None and victim.end > interval.end:
+                self.assignment[interval.identifier] = self.assignment[victim.identifier]
+                self.assignment[victim.identifier] = self._spill_slot()
+                active.remove(victim)
+                active.append(interval)
+            else:
+                self.assignment[interval.identifier] = self._spill_slot()
+
+    def _spill_slot(self):
+        self.stack_offset += -4
+        self.spilled += 1
+        return Stack(offset=self.stack_offset)
+
+    # Rewriting
+
+    def replace_instruction(self, asm_insn):
+        if isinstance(asm_insn, Mov):
+            return Mov(self.replace_operand(asm_insn.op_src), self.replace_operand(asm_insn.op_dst))
+        elif isinstance(asm_insn, Ret):
+            return Ret()
+        elif isinstance(asm_insn, Unary):
+            return Unary(asm_insn.unary_op, self.replace_operand(asm_insn.operand))
+        else:
+            raise TackyAssemblyError("Error replacing instruction", asm_insn)
+
+    def replace_operand(self, asm_op):
+        if isinstance(asm_op, Pseudo):
+            return self.assignment[asm_op.identifier]
+        elif isinstance(asm_op, (Imm, Register)):
+            return asm_op
+        else:
+            raise TackyAssemblyError("Error replacing operand", asm_op)
+
+
+class StackSlotColoring:
+    # Shares 4-byte stack slots between values whose live intervals don't
+    # overlap, so the frame holds the most values live at once rather than
+    # one slot per temporary. Runs on the output of PseudoReplacer or
+    # RegisterAllocator, before FixingUpInstructions sizes the frame.
+    def __init__(self, asm_root: Program):
+        self.asm_root = asm_root
+        self.slot_map: Dict[int, int] = {}
+        self.frame_before = 0
+        self.frame_after = 0
+
+    def replace(self):
+        return self.replace_program(self.asm_root)
+
+    def replace_program(self, asm_program):
+        function = self.replace_function(asm_program.function)
+        return Program(function=function)
+
+    def replace_function(self, asm_function):
+        self.frame_before = abs(asm_function.stack_offset)
+        slots = self.color(live_intervals(asm_function.instructions, Stack, "offset"))
+        self.frame_after = slots * 4
+        cnv_asm_insns = []
+        for asm_insn in asm_function.instructions:
+            cnv_asm_insn = self.replace_instruction(asm_insn)
+            # A copy between two values now sharing a slot is a no-op
+            if isinstance(cnv_asm_insn, Mov) and cnv_asm_insn.op_src == cnv_asm_insn.op_dst:
+                continue
+            cnv_asm_insns.append(cnv_asm_insn)
+        return Function(asm_function.name, cnv_asm_insns, -self.frame_after)
+
+    def color(self, intervals) -> int:
+        # Greedy interval coloring in start order, always taking the lowest
+        # free slot so the frame stays compact. Returns the slots used
+        free = []
+        active = []
+        slots = 0
+        for interval in intervals:
+            # Same reuse rule as RegisterAllocator.allocate
+            still_active = []
+            for other in active:
+                if other.end <= interval.start:
+                    heapq.heappush(free, self.slot_map[other.identifier])
+                else:
+                    still_active.append(other)
+            active = still_active
+
+            if free:
+                slot = heapq.heappop(free)
+            else:
+                slot = slots
+                slots += 1
+            self.slot_map[interval.identifier] = slot
+            active.append(interval)
+        return slots
+
+    def replace_instruction(self, asm_insn):
+        if isinstance(asm_insn, Mov):
+            return Mov(self.replace_operand(asm_insn.op_src), self.replace_operand(asm_insn.op_dst))
+        elif isinstance(asm_insn, Ret):
+            return Ret()
+        elif isinstance(asm_insn, Unary):
+            return Unary(asm_insn.unary_op, self.replace_operand(asm_insn.operand))
+        else:
+            raise TackyAssemblyError("Error replacing instruction", asm_insn)
+
+    def replace_operand(self, asm_op):
+        if isinstance(asm_op, Stack):
+            return Stack(offset=-4 * (self.slot_map[asm_op.offset] + 1))
+        elif isinstance(asm_op, (Imm, Register)):
+            return asm_op
+        else:
+            raise TackyAssemblyError("Error replacing operand", asm_op)
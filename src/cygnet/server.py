@@ -0,0 +1,179 @@
+import io
+import json
+import os
+import signal
+import socket
+import socketserver
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import redirect_stdout, redirect_stderr
+from pathlib import Path
+from typing import Optional
+import typer
+from .client import SOCKET_ENV, LOCAL_ONLY_OPTIONS, default_socket_path, runs_locally
+
+# Compile server: a warm compiler listening on a Unix domain socket, so a
+# call from an editor or build system skips interpreter start and imports.
+#
+# A request is one JSON line {"argv": [...], "cwd": "..."} with exactly the
+# arguments cygnet itself takes; the reply is one JSON line
+# {"exit_code": n, "output": "..."} with everything the compile printed.
+# Connections are accepted on threads and compiles run in a pool of
+# long-lived worker processes that import the whole compiler once, so
+# module state such as the compiler fingerprint stays warm across requests.
+# A worker that dies (a crash in --run, the OOM killer) takes the pool with
+# it, so the pool is replaced and only requests that were running fail.
+
+def warm_worker():
+    # Pool initializer: import every stage up front rather than on the
+    # first request that needs it
+    from . import main, driver, preprocessor, lexer, parser, tackygen, optimizer, codegen
+    from . import regalloc, peephole, emitter, encoder, elf, interpreter, cache
+    from .cache import compiler_fingerprint
+    compiler_fingerprint()
+    # Batches compile file by file in this worker instead of in a nested,
+    # cold pool whose output would bypass the captured stdout
+    driver.set_max_jobs(1)
+
+
+def handle_request(argv, cwd):
+    # Runs one cygnet command line in a worker, returns (exit code, output).
+    # The app runs in standalone mode, as from a shell, so usage errors are
+    # reported the same way and every outcome ends in SystemExit
+    from .main import app
+
+    output = io.StringIO()
+    previous_cwd = os.getcwd()
+    with redirect_stdout(output), redirect_stderr(output):
+        try:
+            os.chdir(cwd)
+            app(args=list(argv), prog_name="cygnet")
+            exit_code = 0
+        except SystemExit as e:
+            exit_code = e.code if isinstance(e.code, int) else 0 if e.code is None else 1
+        except Exception as e:
+            output.write(f"Internal error: {e}\n")
+            exit_code = 1
+        finally:
+            os.chdir(previous_cwd)
+    return exit_code, output.getvalue()
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        try:
+            request = json.loads(line)
+            argv, cwd = request["argv"], request["cwd"]
+            local_only = runs_locally(argv)
+        except (ValueError, KeyError, TypeError):
+            self.reply(2, "Malformed request\n")
+            return
+        if local_only:
+            # A usage error, with the status typer gives one
+            self.reply(2, f"Error: {', '.join(LOCAL_ONLY_OPTIONS)} cannot run in the compile server, "
+                          f"run cygnet directly\n")
+            return
+        try:
+            exit_code, output = self.server.compile(argv, cwd)
+        except Exception as e:
+            exit_code, output = 1, f"Internal error: {e}\n"
+        self.reply(exit_code, output)
+
+    def reply(self, exit_code, output):
+        self.wfile.write(json.dumps({"exit_code": exit_code, "output": output}).encode() + b"\n")
+
+
+class CompileServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: Path, jobs: Optional[int] = None):
+        self.socket_path = Path(socket_path)
+        remove_stale_socket(self.socket_path)
+        self.jobs = jobs or os.cpu_count() or 1
+        self.pool = self.new_pool()
+        self.pool_lock = threading.Lock()
+        super().__init__(str(self.socket_path), RequestHandler)
+
+    def new_pool(self):
+        return ProcessPoolExecutor(max_workers=self.jobs, initializer=warm_worker)
+
+    def compile(self, argv, cwd):
+        pool = self.pool
+        try:
+            future = pool.submit(handle_request, argv, cwd)
+        except BrokenProcessPool:
+            # A worker died after the last request, none of this one has run
+            pool = self.replace_pool(pool)
+            future = pool.submit(handle_request, argv, cwd)
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            # Not retried, the request may well be what killed the worker
+            self.replace_pool(pool)
+            return 1, "Internal error: the worker process compiling this request died\n"
+
+    def replace_pool(self, broken):
+        # Every request on the broken pool fails at once, the first one
+        # here replaces it
+        with self.pool_lock:
+            if self.pool is broken:
+                self.pool = self.new_pool()
+                broken.shutdown(wait=False, cancel_futures=True)
+            return self.pool
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True, cancel_futures=True)
+        if self.socket_path.exists():
+            self.socket_path.unlink()
+
+
+def remove_stale_socket(socket_path: Path):
+    # A leftover socket file from a server that died is removed, a live
+    # server is an error
+    if not socket_path.exists():
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(str(socket_path))
+    except OSError:
+        socket_path.unlink()
+        return
+    finally:
+        probe.close()
+    raise RuntimeError(f"A compile server is already listening on {socket_path}")
+
+
+app = typer.Typer(help="Cygnet compile server")
+
+
+@app.command()
+def serve(
+        socket_path: Optional[Path] = typer.Option(None, "--socket", help=f"Unix socket to listen on (default: ${SOCKET_ENV} or $XDG_RUNTIME_DIR/cygnet-<uid>.sock)"),
+        jobs: Optional[int] = typer.Option(None, "-j", "--jobs", help="Worker processes (default: number of cores)"),
+        ):
+    socket_path = socket_path or default_socket_path()
+    try:
+        server = CompileServer(socket_path, jobs)
+    except RuntimeError as e:
+        typer.echo(f"Error: {e}")
+        raise typer.Exit(1)
+    typer.echo(f"Listening on {socket_path}")
+    # Stop on SIGTERM as on Ctrl-C, so the socket file is removed
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    app()
+
+
+if __name__ == "__main__":
+    main()
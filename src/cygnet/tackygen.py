@@ -91,21 +91,34 @@ class TackyGenerator:
     def generate_statement(self, ast_statement):
         instructions = []
         if isinstance(ast_statement, ASTReturn):
-            val, exp_instructions = self.generate_exp(ast_statement.expr)
-            instructions.extend(exp_instructions)
+            val = self.generate_exp(ast_statement.expr, instructions)
             instructions.append(Return(val))
             return instructions
 
-    def generate_exp(self, ast_exp):
-        match ast_exp:
-            case ASTConstant():
-                return (Constant(ast_exp.value), [])
-            case ASTUnary():
-                src_val, src_instructions = self.generate_exp(ast_exp.expr)
-                dst = self._make_temp()
-                tacky_op = self._convert_unop(ast_exp.unary_op)
-                instruction = Unary(tacky_op, src_val, dst)
-                return (dst, src_instructions + [instruction])
+    def generate_exp(self, ast_exp, instructions):
+        # Post-order walk with an explicit work stack, appending into the
+        # shared instruction list: linear time, and nesting depth is bounded
+        # by memory rather than the Python call stack
+        work = [(ast_exp, False)]
+        values = []
+        while work:
+            node, operands_done = work.pop()
+            match node:
+                case ASTConstant():
+                    values.append(Constant(node.value))
+                case ASTUnary():
+                    if not operands_done:
+                        work.append((node, True))
+                        work.append((node.expr, False))
+                    else:
+                        src_val = values.pop()
+                        dst = self._make_temp()
+                        tacky_op = self._convert_unop(node.unary_op)
+                        instructions.append(Unary(tacky_op, src_val, dst))
+                        values.append(dst)
+                case _:
+                    raise TackyGenError("Unexpected expression", node)
+        return values.pop()
                 
     def _make_temp(self):
         name = f"tmp.{self.temp_ctr}" 
@@ -1,6 +1,8 @@
 from enum import Enum, auto
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, Optional, Iterable
 from dataclasses import dataclass
+from collections import deque
+from array import array
 
 # Token type definitions
 
@@ -31,14 +33,16 @@ KEYWORDS = {
     "return": TokenType.RETURN,
     }
 
+# Python's regex alternation is first-match, not longest-match, so any
+# pattern that is a prefix of another must come after it ('-' after '--').
 PATTERNS = [
     (r'\s+', None),
     (r'//.*', None),
     (r'[a-zA-Z_]\w*\b', TokenType.IDENTIFIER),
     (r'[0-9]+\b', TokenType.CONSTANT),
     (r'~', TokenType.COMPLEMENT),
-    (r'-', TokenType.NEGATE),
     (r'--', TokenType.DECREMENT),
+    (r'-', TokenType.NEGATE),
     (r'\(', TokenType.PAREN_OPEN),
     (r'\)', TokenType.PAREN_CLOSE),
     (r'{', TokenType.BRACE_OPEN),
@@ -46,8 +50,121 @@ PATTERNS = [
     (r';', TokenType.SEMICOLON),
 ]
 
-@dataclass
+
+def constant_value(text: str) -> int:
+    # Value of an integer constant's text. A leading 0 means octal, as in C
+    # and in the assembler that reads the emitted $010; raises ValueError
+    # for digits that aren't valid octal
+    if len(text) > 1 and text.startswith("0"):
+        return int(text, 8)
+    return int(text)
+
+
+@dataclass(slots=True)
 class Token:
     type: TokenType
     value: Optional[str] = None
     line_num: int = 0
+    column: int = 0
+    offset: int = 0
+
+
+# Compact type codes for TokenBuffer, TokenType values are small auto() ints
+TYPE_BY_CODE = {token_type.value: token_type for token_type in TokenType}
+
+
+class TokenBuffer:
+    # Struct-of-arrays token store: each token costs a few machine integers
+    # rather than a Token object, and values are sliced from the source text
+    # only when read through a TokenView
+    def __init__(self, source: str):
+        self.source = source
+        self.types = array('B')
+        self.offsets = array('I')
+        self.lengths = array('I')
+        self.lines = array('I')
+        self.columns = array('I')
+
+    def append(self, token_type: TokenType, offset: int, length: int, line_num: int, column: int):
+        self.types.append(token_type.value)
+        self.offsets.append(offset)
+        self.lengths.append(length)
+        self.lines.append(line_num)
+        self.columns.append(column)
+
+    def value(self, index: int) -> Optional[str]:
+        if self.types[index] == TokenType.EOF.value:
+            return None
+        offset = self.offsets[index]
+        return self.source[offset:offset + self.lengths[index]]
+
+    def __len__(self):
+        return len(self.types)
+
+    def __getitem__(self, index: int) -> 'TokenView':
+        if index < 0:
+            index += len(self.types)
+        if not 0 <= index < len(self.types):
+            raise IndexError("TokenBuffer index out of range")
+        return TokenView(self, index)
+
+    def __iter__(self):
+        for index in range(len(self.types)):
+            yield TokenView(self, index)
+
+
+class TokenView:
+    # Read-only stand-in for Token backed by one TokenBuffer slot
+    __slots__ = ("buffer", "index")
+
+    def __init__(self, buffer: TokenBuffer, index: int):
+        self.buffer = buffer
+        self.index = index
+
+    @property
+    def type(self) -> TokenType:
+        return TYPE_BY_CODE[self.buffer.types[self.index]]
+
+    @property
+    def value(self) -> Optional[str]:
+        return self.buffer.value(self.index)
+
+    @property
+    def line_num(self) -> int:
+        return self.buffer.lines[self.index]
+
+    @property
+    def column(self) -> int:
+        return self.buffer.columns[self.index]
+
+    @property
+    def offset(self) -> int:
+        return self.buffer.offsets[self.index]
+
+    def __repr__(self):
+        return f"TokenView(type={self.type}, value={self.value!r}, line_num={self.line_num})"
+
+
+class TokenStream:
+    # Pulls tokens from any iterable on demand, holding only a small
+    # lookahead window so the producer (e.g. Lexer.tokenize) can be lazy
+    def __init__(self, tokens: Iterable[Token], lookahead: int = 2):
+        self.source = iter(tokens)
+        self.lookahead = lookahead
+        self.window = deque(maxlen=lookahead)
+
+    def peek(self, distance: int = 0) -> Optional[Token]:
+        if distance >= self.lookahead:
+            raise IndexError(f"Lookahead {distance} exceeds window of {self.lookahead}")
+        while len(self.window) <= distance:
+            token = next(self.source, None)
+            if token is None:
+                return None
+            self.window.append(token)
+        return self.window[distance]
+
+    def advance(self) -> Optional[Token]:
+        token = self.peek()
+        if token is not None:
+            self.window.popleft()
+        return token
@@ -0,0 +1,292 @@
+import os
+import select
+import struct
+import time
+from dataclasses import replace
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+from .print import print, print_error, set_log_level
+from .enums import SUCCESS, FAIL, COMPILE_FAILED_STATUS, CompileStage, PrintFlags, CompileOptions
+from .driver import EXECUTE_STAGES, preprocess, compile_preprocessed, open_cache, output_path
+from .metrics import PipelineMetrics
+
+# --watch: stay running and recompile whenever a source or one of the
+# headers it includes changes. Only the sources that depend on a changed
+# file are preprocessed again, and a source whose preprocessed text is the
+# same as last time is not compiled at all. Otherwise the usual compile
+# runs, so artifacts still in the cache are reused rather than rebuilt.
+#
+# Changes come from inotify on the directories holding sources and headers,
+# or from polling modification times where inotify is not available. Every
+# directory under a directory given on the command line is watched,
+# including ones created while watching, so new sources anywhere in the
+# tree are picked up.
+
+# inotify_event: int wd, uint32 mask, cookie, len, then len bytes of name
+INOTIFY_EVENT = struct.Struct("iIII")
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+# An editor save is often several events (truncate, write, rename), they
+# are collected until the directory has been quiet this long
+SETTLE_SECONDS = 0.02
+POLL_SECONDS = 0.25
+
+SOURCE_SUFFIX = ".c"
+
+
+class InotifyWatcher:
+    # Directory watches on one inotify descriptor, read through ctypes
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        libc.inotify_add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self.libc = libc
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.directories: Dict[int, Path] = {}
+
+    def watch(self, directories: Set[Path], files: Set[Path]):
+        watched = set(self.directories.values())
+        for directory in directories - watched:
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+            if wd >= 0:
+                self.directories[wd] = directory
+
+    def wait(self) -> Optional[Set[Path]]:
+        # Blocks until something changes, returns the changed paths or None
+        # if events were lost and everything has to be checked
+        changed = set()
+        timeout = None
+        while True:
+            ready, _, _ = select.select([self.fd], [], [], timeout)
+            if not ready:
+                return changed
+            data = os.read(self.fd, 64 * 1024)
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+                offset += INOTIFY_EVENT.size
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+                if mask & IN_Q_OVERFLOW:
+                    return None
+                if mask & IN_IGNORED:
+                    # The directory is gone, a new one by that name needs a new watch
+                    self.directories.pop(wd, None)
+                    continue
+                directory = self.directories.get(wd)
+                if directory is not None and name:
+                    changed.add(directory / os.fsdecode(name))
+            timeout = SETTLE_SECONDS
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    # Fallback: compares modification times of the watched files, and the
+    # source files and subdirectories in the watched directories, every
+    # POLL_SECONDS
+    def __init__(self, interval: float = POLL_SECONDS):
+        self.interval = interval
+        self.directories: Set[Path] = set()
+        self.files: Set[Path] = set()
+        self.mtimes = self.scan()
+
+    def watch(self, directories: Set[Path], files: Set[Path]):
+        # Paths already known keep their old time, so a change made while
+        # the last rebuild ran is still seen
+        self.directories, self.files = set(directories), set(files)
+        self.mtimes = {path: self.mtimes.get(path, mtime) for path, mtime in self.scan().items()}
+
+    def scan(self) -> Dict[Path, int]:
+        paths = set(self.files)
+        for directory in self.directories:
+            try:
+                paths.update(entry for entry in directory.iterdir()
+                             if entry.suffix == SOURCE_SUFFIX or entry.is_dir())
+            except OSError:
+                pass
+        mtimes = {}
+        for path in paths:
+            try:
+                mtimes[path] = path.stat().st_mtime_ns
+            except OSError:
+                pass
+        return mtimes
+
+    def wait(self) -> Optional[Set[Path]]:
+        while True:
+            time.sleep(self.interval)
+            mtimes = self.scan()
+            changed = {path for path in mtimes.keys() | self.mtimes.keys()
+                       if mtimes.get(path) != self.mtimes.get(path)}
+            self.mtimes = mtimes
+            if changed:
+                return changed
+
+    def close(self):
+        pass
+
+
+def open_watcher():
+    try:
+        return InotifyWatcher()
+    except (OSError, AttributeError, TypeError):
+        return PollingWatcher()
+
+
+class WatchedSource:
+    # What is remembered about a source between rebuilds
+    def __init__(self, path: Path):
+        self.path = path
+        self.dependencies: Set[Path] = {path}
+        self.text: Optional[str] = None
+        self.result: Optional[int] = None
+
+
+class WatchSession:
+    def __init__(self, paths: List[Path], stage: CompileStage, print_flags: PrintFlags, options: CompileOptions):
+        self.stage = stage
+        self.print_flags = print_flags
+        self.options = options
+        # Directories given on the command line, new sources there are picked up
+        self.source_dirs = {path.resolve() for path in paths if path.is_dir()}
+        # They and every directory below them, all watched
+        self.tree_dirs: Set[Path] = set()
+        for directory in self.source_dirs:
+            self.add_tree(directory)
+        self.sources: Dict[Path, WatchedSource] = {}
+        for path in paths:
+            found = sorted(path.rglob(f"*{SOURCE_SUFFIX}")) if path.is_dir() else [path]
+            for source in found:
+                self.sources.setdefault(source.resolve(), WatchedSource(source.resolve()))
+        # The on-disk cache is opened once and kept for the whole session
+        self.cache = open_cache(stage, print_flags, options)
+        self.watcher = open_watcher()
+
+    def run(self) -> int:
+        print(f"Watching {len(self.sources)} source(s) with "
+              f"{'inotify' if isinstance(self.watcher, InotifyWatcher) else 'polling'}, Ctrl-C to stop")
+        for source in list(self.sources.values()):
+            self.rebuild(source)
+        try:
+            while True:
+                self.update_watches()
+                changed = self.watcher.wait()
+                for source in self.affected(changed):
+                    self.rebuild(source)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.watcher.close()
+        return SUCCESS
+
+    def update_watches(self):
+        files = set().union(*(source.dependencies for source in self.sources.values()))
+        self.watcher.watch({path.parent for path in files} | self.tree_dirs, files)
+
+    def add_tree(self, directory: Path) -> List[Path]:
+        # Starts watching directory and the ones below it, returns the
+        # directories that were new
+        added = [path for path in [directory, *directory.rglob("*")]
+                 if path.is_dir() and path not in self.tree_dirs]
+        self.tree_dirs.update(added)
+        return added
+
+    def in_source_dirs(self, path: Path) -> bool:
+        return any(path.is_relative_to(directory) for directory in self.source_dirs)
+
+    def affected(self, changed: Optional[Set[Path]]) -> List[WatchedSource]:
+        if changed is None:
+            return list(self.sources.values())
+        changed = {path.resolve() for path in changed}
+        self.tree_dirs = {directory for directory in self.tree_dirs if directory.is_dir()}
+        for path in list(changed):
+            if path.is_dir() and path not in self.tree_dirs and self.in_source_dirs(path):
+                # A new directory may already hold sources by the time it is
+                # watched, they count as changed
+                for directory in self.add_tree(path):
+                    changed.update(source.resolve() for source in directory.glob(f"*{SOURCE_SUFFIX}"))
+        for path in changed:
+            if (path.suffix == SOURCE_SUFFIX and path not in self.sources and path.is_file()
+                    and self.in_source_dirs(path)):
+                self.sources[path] = WatchedSource(path)
+        for path in [path for path in changed if path in self.sources and not path.exists()]:
+            del self.sources[path]
+            self.report(path, "removed")
+        return [source for source in self.sources.values() if source.dependencies & changed]
+
+    def rebuild(self, source: WatchedSource):
+        # One source failing for any reason is reported, watching goes on
+        start = time.perf_counter()
+        try:
+            self.build(source, start)
+        except Exception as e:
+            print_error(f"{source.path}: {e}")
+            source.text, source.result = None, FAIL
+            self.report(source.path, "[red]failed[/red]", start)
+
+    def build(self, source: WatchedSource, start: float):
+        path = source.path
+        set_log_level("INFO" if self.options.verbose else "WARNING")
+        metrics = PipelineMetrics(str(path), enabled=self.options.time_report is not None)
+        with metrics.stage("preprocess"):
+            text, dependencies = preprocess(path, self.options)
+        if dependencies:
+            source.dependencies = {dependency.resolve() for dependency in dependencies} | {path}
+        if text is None:
+            source.text, source.result = None, FAIL
+            self.report(path, "[red]failed[/red]", start)
+            return
+
+        # Same preprocessed text as the last good build: nothing to redo
+        if (text == source.text and source.result == SUCCESS and self.stage not in EXECUTE_STAGES
+                and (self.stage not in (CompileStage.ASSEMBLE, CompileStage.OBJECT, CompileStage.LINK)
+                     or output_path(path, self.stage, self.options).exists())):
+            self.report(path, "unchanged", start)
+            return
+
+        result = compile_preprocessed(path, text, dependencies, self.stage, self.print_flags, self.options,
+                                      self.cache, metrics)
+        source.text, source.result = text, result
+        if self.stage in EXECUTE_STAGES and result != COMPILE_FAILED_STATUS:
+            self.report(path, f"main returned {result}", start)
+        elif result == SUCCESS:
+            self.report(path, "[green]ok[/green]", start)
+        else:
+            self.report(path, "[red]failed[/red]", start)
+
+    def report(self, path: Path, status: str, start: Optional[float] = None):
+        elapsed = f" ({(time.perf_counter() - start) * 1000:.1f} ms)" if start is not None else ""
+        print(f"[{time.strftime('%H:%M:%S')}] {os.path.relpath(path)}: {status}{elapsed}")
+
+
+def watch_sources(paths: List[Path], stage: CompileStage, print_flags: PrintFlags, options: CompileOptions = None,
+                  output: Optional[Path] = None) -> int:
+    # Entry point for --watch, paths are source files or directories of them
+    if options is None:
+        options = CompileOptions()
+    missing = [path for path in paths if not path.exists()]
+    if missing:
+        print_error(f"No such file or directory: {', '.join(str(path) for path in missing)}")
+        return FAIL
+    if output is not None:
+        if len(paths) > 1 or paths[0].is_dir():
+            print_error("--watch with -o takes a single source file")
+            return FAIL
+        options = replace(options, output=output)
+    return WatchSession(paths, stage, print_flags, options).run()